@@ -13,25 +13,51 @@ Version 4.1 - PURE HOURLY RHYTHM CONTROL
 - Symmetric response for warming and cooling
 """
 
+from collections import namedtuple
+from dataclasses import dataclass, fields
+from functools import lru_cache
 from pathlib import Path
 import os
 
 # Load environment variables from .env file (if python-dotenv is installed)
+# Parsed once per .env modification time; real environment variables take precedence.
 try:
-    from dotenv import load_dotenv
-    load_dotenv()
+    from dotenv import dotenv_values, find_dotenv
 except ImportError:
     # python-dotenv not installed - environment variables must be set manually
-    pass
+    dotenv_values = find_dotenv = None
+
+
+@lru_cache(maxsize=1)
+def _cached_dotenv_load(env_path: str, mtime_ns: int) -> dict:
+    """Parse .env file into a dict (cached per path and st_mtime_ns)."""
+    return {k: v for k, v in dotenv_values(env_path).items() if v is not None}
+
+
+def _load_env_snapshot() -> dict:
+    """Snapshot of .env values overlaid with the process environment."""
+    snapshot = {}
+    if find_dotenv is not None:
+        env_path = find_dotenv()
+        if env_path:
+            try:
+                snapshot.update(_cached_dotenv_load(env_path, os.stat(env_path).st_mtime_ns))
+            except OSError:
+                pass
+    snapshot.update(os.environ)
+    return snapshot
+
+
+_ENV_SNAPSHOT = _load_env_snapshot()
 
 # ================== Credentials ==================
 # Loaded from environment variables (.env file)
 
 CREDENTIALS = {
-    "lk_email": os.getenv("LK_EMAIL", ""),
-    "lk_password": os.getenv("LK_PASSWORD", ""),
-    "mel_email": os.getenv("MEL_EMAIL", ""),
-    "mel_password": os.getenv("MEL_PASSWORD", ""),
+    "lk_email": _ENV_SNAPSHOT.get("LK_EMAIL", ""),
+    "lk_password": _ENV_SNAPSHOT.get("LK_PASSWORD", ""),
+    "mel_email": _ENV_SNAPSHOT.get("MEL_EMAIL", ""),
+    "mel_password": _ENV_SNAPSHOT.get("MEL_PASSWORD", ""),
 }
 
 # ================== Manual Mode (v5.5) ==================
@@ -85,6 +111,8 @@ APPLICATION = {
     "apply_interval_minutes": 60,      # Apply flow changes only once per hour (at XX:00)
     "max_step_per_hour": 1,            # Maximum ±1°C change per hour (or OFF↔28°C)
     "apply_window_minutes": 10,        # Apply if within 10 minutes of hour boundary
+    "monitor_skip_melcloud": False,    # Skip MELCloud reads between hours (CSV gets blank MEL columns);
+                                       # ignored while the DHW guard is enabled (it needs the tank temp every run)
 }
 
 # ================== Weather Curve with Min/Ref/Max (v4.0) ==================
@@ -156,9 +184,10 @@ NETWORK = {
 SHELLY = {
     "enable": True,                    # Enable Shelly backup thermometer
     "server_uri": "https://shelly-103-eu.shelly.cloud",
-    "auth_key": os.getenv("SHELLY_AUTH_KEY", ""),  # Loaded from .env file
-    "device_id": os.getenv("SHELLY_DEVICE_ID", ""),  # Loaded from .env file
+    "auth_key": _ENV_SNAPSHOT.get("SHELLY_AUTH_KEY", ""),  # Loaded from .env file
+    "device_id": _ENV_SNAPSHOT.get("SHELLY_DEVICE_ID", ""),  # Loaded from .env file
     "timeout": 20,                     # Shelly API timeout (seconds)
+    "always_log": False,               # Fetch (and log to CSV) every run, not only when LK Systems fails
 }
 
 # ================== Room Configuration ==================
@@ -263,6 +292,274 @@ CONFIG = {
     "holiday_flow_limits": HOLIDAY_FLOW_LIMITS,
 }
 
+# ================== Typed Config (v5.6) ==================
+# Frozen, slotted attribute view of CONFIG built once at import.
+# New code should read CFG.<section>.<field>; CONFIG stays as the legacy dict form.
+
+
+@dataclass(frozen=True)
+class Credentials:
+    __slots__ = ("lk_email", "lk_password", "mel_email", "mel_password")
+    lk_email: str
+    lk_password: str
+    mel_email: str
+    mel_password: str
+
+
+@dataclass(frozen=True)
+class ManualMode:
+    __slots__ = ("enable",)
+    enable: int
+
+
+@dataclass(frozen=True)
+class HolidayMode:
+    __slots__ = ("mode", "start_date", "start_time", "end_date", "end_time")
+    mode: int
+    start_date: str
+    start_time: str
+    end_date: str
+    end_time: str
+
+
+@dataclass(frozen=True)
+class FlowLimits:
+    __slots__ = ("off", "min_on", "max")
+    off: float
+    min_on: float
+    max: float
+
+
+@dataclass(frozen=True)
+class Control:
+    __slots__ = ("target_room_temp",)
+    target_room_temp: float
+
+
+@dataclass(frozen=True)
+class Application:
+    __slots__ = (
+        "monitor_interval_minutes", "apply_interval_minutes", "max_step_per_hour", "apply_window_minutes",
+        "monitor_skip_melcloud",
+    )
+    monitor_interval_minutes: int
+    apply_interval_minutes: int
+    max_step_per_hour: int
+    apply_window_minutes: int
+    monitor_skip_melcloud: bool
+
+
+@dataclass(frozen=True)
+class WeatherCurve:
+    __slots__ = ("anchors",)
+    anchors: tuple  # ((outdoor_temp, min_flow, reference_flow, max_flow), ...)
+
+
+@dataclass(frozen=True)
+class ControlZones:
+    __slots__ = ("stable_error", "stable_pred_error")
+    stable_error: float
+    stable_pred_error: float
+
+
+@dataclass(frozen=True)
+class Prediction:
+    __slots__ = ("lookback_readings", "lookahead_minutes", "transition_damping")
+    lookback_readings: int
+    lookahead_minutes: int
+    transition_damping: float
+
+
+@dataclass(frozen=True)
+class Ema:
+    __slots__ = ("alpha_outdoor",)
+    alpha_outdoor: float
+
+
+@dataclass(frozen=True)
+class DhwGuard:
+    __slots__ = ("enable", "temp_rise_threshold", "timeout_minutes")
+    enable: bool
+    temp_rise_threshold: float
+    timeout_minutes: int
+
+
+@dataclass(frozen=True)
+class Network:
+    __slots__ = ("timeout", "retries", "retry_sleep")
+    timeout: int
+    retries: int
+    retry_sleep: int
+
+
+@dataclass(frozen=True)
+class Shelly:
+    __slots__ = ("enable", "server_uri", "auth_key", "device_id", "timeout", "always_log")
+    enable: bool
+    server_uri: str
+    auth_key: str
+    device_id: str
+    timeout: int
+    always_log: bool
+
+
+@dataclass(frozen=True)
+class Rooms:
+    __slots__ = ("excluded_names",)
+    excluded_names: frozenset
+
+
+@dataclass(frozen=True)
+class Csv:
+    __slots__ = ("path",)
+    path: Path
+
+
+@dataclass(frozen=True)
+class Overshoot:
+    __slots__ = ("readings", "error_threshold")
+    readings: int
+    error_threshold: float
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    __slots__ = (
+        "credentials", "flow_limits", "control", "application", "weather_curve",
+        "control_zones", "prediction", "ema", "dhw_guard", "network", "shelly",
+        "overshoot", "rooms", "csv", "manual_mode", "holiday_mode", "holiday_control",
+        "holiday_weather_curve", "holiday_control_zones", "holiday_flow_limits",
+    )
+    credentials: Credentials
+    flow_limits: FlowLimits
+    control: Control
+    application: Application
+    weather_curve: WeatherCurve
+    control_zones: ControlZones
+    prediction: Prediction
+    ema: Ema
+    dhw_guard: DhwGuard
+    network: Network
+    shelly: Shelly
+    overshoot: Overshoot
+    rooms: Rooms
+    csv: Csv
+    manual_mode: ManualMode
+    holiday_mode: HolidayMode
+    holiday_control: Control
+    holiday_weather_curve: WeatherCurve
+    holiday_control_zones: ControlZones
+    holiday_flow_limits: FlowLimits
+
+
+# Optional keys, with the defaults the dict-based code fell back to via .get();
+# every other field is required. Sections listed here may also be left out of CONFIG.
+_SECTION_DEFAULTS = {
+    Application: {"monitor_skip_melcloud": False},
+    Shelly: {"enable": False, "server_uri": "", "auth_key": "", "device_id": "", "timeout": 20, "always_log": False},
+    Overshoot: {"readings": 3, "error_threshold": -0.1},
+    ManualMode: {"enable": 0},
+    HolidayMode: {"mode": 0, "start_date": "", "start_time": "00:00", "end_date": "", "end_time": "23:59"},
+}
+
+
+def _section(cls, values: dict):
+    """
+    Build a frozen config section from its dict.
+    
+    Keys that are not fields of cls are ignored. Missing optional keys take their
+    _SECTION_DEFAULTS value; a missing required key raises KeyError.
+    """
+    defaults = _SECTION_DEFAULTS.get(cls, {})
+    kwargs = {}
+    for f in fields(cls):
+        if f.name in values:
+            kwargs[f.name] = values[f.name]
+        elif f.name in defaults:
+            kwargs[f.name] = defaults[f.name]
+        else:
+            raise KeyError(f"CONFIG section for {cls.__name__} is missing required key {f.name!r}")
+    return cls(**kwargs)
+
+
+def _build_app_config() -> AppConfig:
+    """Build the typed CFG tree from CONFIG (holiday sections fall back to normal ones)."""
+    return AppConfig(
+        credentials=_section(Credentials, CONFIG["credentials"]),
+        flow_limits=_section(FlowLimits, CONFIG["flow_limits"]),
+        control=_section(Control, CONFIG["control"]),
+        application=_section(Application, CONFIG["application"]),
+        weather_curve=WeatherCurve(anchors=tuple(map(tuple, CONFIG["weather_curve"]["anchors"]))),
+        control_zones=_section(ControlZones, CONFIG["control_zones"]),
+        prediction=_section(Prediction, CONFIG["prediction"]),
+        ema=_section(Ema, CONFIG["ema"]),
+        dhw_guard=_section(DhwGuard, CONFIG["dhw_guard"]),
+        network=_section(Network, CONFIG["network"]),
+        shelly=_section(Shelly, CONFIG.get("shelly", {})),
+        overshoot=_section(Overshoot, CONFIG.get("overshoot", {})),
+        rooms=Rooms(excluded_names=frozenset(CONFIG["rooms"]["excluded_names"])),
+        csv=_section(Csv, CONFIG["csv"]),
+        manual_mode=_section(ManualMode, CONFIG.get("manual_mode", {})),
+        holiday_mode=_section(HolidayMode, CONFIG.get("holiday_mode", {})),
+        holiday_control=_section(Control, CONFIG.get("holiday_control", CONFIG["control"])),
+        holiday_weather_curve=WeatherCurve(anchors=tuple(map(tuple, CONFIG.get("holiday_weather_curve", CONFIG["weather_curve"])["anchors"]))),
+        holiday_control_zones=_section(ControlZones, CONFIG.get("holiday_control_zones", CONFIG["control_zones"])),
+        holiday_flow_limits=_section(FlowLimits, CONFIG.get("holiday_flow_limits", CONFIG["flow_limits"])),
+    )
+
+
+CFG = _build_app_config()
+
+# ================== Resolved Control Config ==================
+# Flat snapshot of the values hourly_rhythm_decision() reads on every call,
+# taken from CFG (which already applies the holiday fallbacks) so both views agree.
+
+_ResolvedConfig = namedtuple(
+    "_ResolvedConfig",
+    "stable_err stable_pred_err off min_on max_cap max_step weather_curve",
+)
+
+
+def _resolve_config(cfg: AppConfig, use_holiday_mode: bool) -> _ResolvedConfig:
+    """Resolve the control config for normal or holiday mode from the CFG tree."""
+    if use_holiday_mode:
+        zones, limits, weather_curve = cfg.holiday_control_zones, cfg.holiday_flow_limits, cfg.holiday_weather_curve
+    else:
+        zones, limits, weather_curve = cfg.control_zones, cfg.flow_limits, cfg.weather_curve
+    
+    return _ResolvedConfig(
+        stable_err=zones.stable_error,
+        stable_pred_err=zones.stable_pred_error,
+        off=limits.off,
+        min_on=limits.min_on,
+        max_cap=limits.max,
+        max_step=cfg.application.max_step_per_hour,
+        weather_curve=weather_curve,
+    )
+
+
+_NORMAL_CFG = _resolve_config(CFG, False)
+_HOLIDAY_CFG = _resolve_config(CFG, True)
+
+
+def resolved_config(use_holiday_mode: bool = False) -> _ResolvedConfig:
+    """Get the resolved control config for normal or holiday mode."""
+    return _HOLIDAY_CFG if use_holiday_mode else _NORMAL_CFG
+
+
+def invalidate_config_cache() -> None:
+    """
+    Rebuild config snapshots from CONFIG.
+    
+    Rebinds config.CFG; modules that did `from config import CFG` keep the old tree.
+    After modifying CONFIG (e.g. in tests) call control_logic.reload_config() instead:
+    it calls this and also rebuilds the settings control_logic derives from CONFIG.
+    """
+    global CFG, _NORMAL_CFG, _HOLIDAY_CFG
+    CFG = _build_app_config()
+    _NORMAL_CFG = _resolve_config(CFG, False)
+    _HOLIDAY_CFG = _resolve_config(CFG, True)
+
 # ================== Version ==================
 
 VERSION = "5.6"  # Added date/time-based holiday mode (mode 0/1/2)
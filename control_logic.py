@@ -19,27 +19,50 @@ Version 5.6 - Date/Time-Based Holiday Mode
 Key principle: Decide once per hour. Monitor with predictions in between.
 """
 
-from typing import Optional, Tuple, List
-from utils import log, fmt1, fmt2
-from config import CONFIG
+from array import array
+from bisect import bisect_right
+from collections import deque, namedtuple
+from dataclasses import dataclass
+from itertools import islice
+from operator import mul
+from typing import Callable, Deque, Dict, Iterable, Optional, Sequence, Tuple, List
+from utils import fmt1, fmt2
+import config
+from config import WeatherCurve, invalidate_config_cache, resolved_config
 
+# DHW guard settings, resolved once at import (timeout pre-converted to seconds)
+_DhwGuardConfig = namedtuple("_DhwGuardConfig", "enable rise timeout_s")
 
-def get_weather_curve(outdoor_temp: float, weather_curve_config: Optional[dict] = None) -> Tuple[float, float, float]:
+
+def _build_dhw_cfg() -> _DhwGuardConfig:
+    """Resolve the DHW guard settings from config.CFG."""
+    dhw_guard = config.CFG.dhw_guard
+    return _DhwGuardConfig(
+        enable=dhw_guard.enable,
+        rise=dhw_guard.temp_rise_threshold,
+        timeout_s=dhw_guard.timeout_minutes * 60,
+    )
+
+
+_DHW_CFG = _build_dhw_cfg()
+
+
+def _interpolate_weather_curve(
+    outdoor_temp: float,
+    anchors: List[Tuple[float, float, float, float]],
+    anchor_temps: Optional[List[float]] = None,
+) -> Tuple[float, float, float]:
     """
-    Get min, reference, and max flow for given outdoor temperature.
-    Uses linear interpolation between anchors.
+    Linearly interpolate min, reference, and max flow between weather curve anchors.
     
     Args:
         outdoor_temp: Outdoor temperature (°C)
-        weather_curve_config: Optional weather curve config dict (defaults to CONFIG["weather_curve"])
+        anchors: Sorted list of (outdoor_temp, min_flow, reference_flow, max_flow)
+        anchor_temps: Optional pre-extracted anchor temperatures (bisect keys)
     
     Returns:
         (min_flow, reference_flow, max_flow) in °C
     """
-    if weather_curve_config is None:
-        weather_curve_config = CONFIG["weather_curve"]
-    anchors = weather_curve_config["anchors"]
-    
     # Below lowest anchor
     if outdoor_temp <= anchors[0][0]:
         return (anchors[0][1], anchors[0][2], anchors[0][3])
@@ -48,32 +71,194 @@ def get_weather_curve(outdoor_temp: float, weather_curve_config: Optional[dict]
     if outdoor_temp >= anchors[-1][0]:
         return (anchors[-1][1], anchors[-1][2], anchors[-1][3])
     
+    # Locate the segment anchors[i] <= outdoor_temp < anchors[i + 1]
+    if anchor_temps is None:
+        anchor_temps = [a[0] for a in anchors]
+    i = bisect_right(anchor_temps, outdoor_temp) - 1
+    t0, min0, ref0, max0 = anchors[i]
+    t1, min1, ref1, max1 = anchors[i + 1]
+    
     # Linear interpolation between anchors
-    for i in range(len(anchors) - 1):
-        t0, min0, ref0, max0 = anchors[i]
-        t1, min1, ref1, max1 = anchors[i + 1]
-        
-        if t0 <= outdoor_temp <= t1:
-            if t1 == t0:
-                return (min0, ref0, max0)
-            
-            # Interpolate
-            ratio = (outdoor_temp - t0) / (t1 - t0)
-            min_flow = min0 + ratio * (min1 - min0)
-            ref = ref0 + ratio * (ref1 - ref0)
-            max_flow = max0 + ratio * (max1 - max0)
-            return (min_flow, ref, max_flow)
+    ratio = (outdoor_temp - t0) / (t1 - t0)
+    min_flow = min0 + ratio * (min1 - min0)
+    ref = ref0 + ratio * (ref1 - ref0)
+    max_flow = max0 + ratio * (max1 - max0)
+    return (min_flow, ref, max_flow)
+
+
+# Weather curve lookup tables: 0.1°C steps between the lowest and highest anchor.
+# Anchors are static config, so the interpolation is done once per curve instead
+# of on every call. Outside the anchor range the curve is flat (clamped index).
+# Inputs that fall between grid points (e.g. an unrounded outdoor EMA) are
+# interpolated from the anchors directly, so results match the plain curve exactly.
+_WEATHER_LUT_RES = 10  # Table entries per °C
+
+_WEATHER_LUT_CACHE_SIZE = 8  # Distinct curve configs kept (normal + holiday + ad-hoc callers)
+
+# Prebuilt table for one curve:
+# - t_steps: t_min in table steps; entry i is for outdoor temp (t_steps + i) / _WEATHER_LUT_RES,
+#   which is the same float as the 0.1°C decimal (e.g. 0.3), whereas t_min + i / 10 can be off by an ulp
+# - rows: (min, ref, max) tuple per 0.1°C entry from t_min, returned as-is by get_weather_curve();
+#   min/max are whole °C (flows are only ever commanded in whole degrees), ref stays float
+#   since it is logged as-is
+# - anchors/anchor_temps: kept for inputs between grid points
+_WeatherLut = namedtuple("_WeatherLut", "t_steps last_idx rows anchors anchor_temps")
+
+# id(weather_curve_config) -> (weather_curve_config, _WeatherLut)
+# The config object is kept alive alongside its tables so its id cannot be reused
+_WEATHER_LUTS: Dict[int, Tuple[dict, _WeatherLut]] = {}
+
+
+def _build_weather_lut(anchors: List[Tuple[float, float, float, float]]) -> _WeatherLut:
+    """
+    Build the min/ref/max lookup table for a weather curve.
+    
+    Args:
+        anchors: Sorted list of (outdoor_temp, min_flow, reference_flow, max_flow)
+    
+    Returns:
+        _WeatherLut for the curve
+    """
+    anchor_temps = [a[0] for a in anchors]
+    t_steps = round(anchor_temps[0] * _WEATHER_LUT_RES)
+    last_idx = round(anchor_temps[-1] * _WEATHER_LUT_RES) - t_steps
+    rows = []
+    for i in range(last_idx + 1):
+        min_flow, ref_flow, max_flow = _interpolate_weather_curve((t_steps + i) / _WEATHER_LUT_RES, anchors, anchor_temps)
+        rows.append((int(min_flow), ref_flow, int(max_flow)))
+    return _WeatherLut(t_steps, last_idx, tuple(rows), anchors, anchor_temps)
+
+
+def _weather_lut(weather_curve_config) -> _WeatherLut:
+    """Get (building on first use) the lookup tables for a weather curve (WeatherCurve or legacy dict)."""
+    entry = _WEATHER_LUTS.get(id(weather_curve_config))
+    if entry is None:
+        if len(_WEATHER_LUTS) >= _WEATHER_LUT_CACHE_SIZE:
+            _WEATHER_LUTS.clear()
+        if isinstance(weather_curve_config, WeatherCurve):
+            anchors = weather_curve_config.anchors
+        else:
+            anchors = weather_curve_config["anchors"]
+        entry = (weather_curve_config, _build_weather_lut(anchors))
+        _WEATHER_LUTS[id(weather_curve_config)] = entry
+    return entry[1]
+
+
+def _weather_lut_lookup(lut: _WeatherLut, outdoor_temp: float) -> Tuple[int, float, int]:
+    """
+    Look up (min, ref, max) flow for an outdoor temperature in prebuilt weather curve tables.
     
-    # Fallback (should never reach here)
-    return (anchors[-1][1], anchors[-1][2], anchors[-1][3])
+    Grid points (and the flat ends) come straight from the table; anything in between
+    is interpolated from the anchors, exactly as the table entries were.
+    """
+    t_steps, last_idx, lut_rows = lut.t_steps, lut.last_idx, lut.rows
+    idx = max(0, min(last_idx, round(outdoor_temp * _WEATHER_LUT_RES) - t_steps))
+    grid_temp = (t_steps + idx) / _WEATHER_LUT_RES
+    if (
+        outdoor_temp == grid_temp
+        or (idx == 0 and outdoor_temp < grid_temp)
+        or (idx == last_idx and outdoor_temp > grid_temp)
+    ):
+        # Shared prebuilt tuple (no allocation)
+        return lut_rows[idx]
+    
+    min_flow, ref_flow, max_flow = _interpolate_weather_curve(outdoor_temp, lut.anchors, lut.anchor_temps)
+    return (int(min_flow), ref_flow, int(max_flow))
+
+
+def clear_weather_curve_cache() -> None:
+    """Drop cached weather curve tables and rebuild them from config.CFG (after config reload)."""
+    global _WEATHER_LUT_NORMAL, _WEATHER_LUT_HOLIDAY
+    _WEATHER_LUTS.clear()
+    _WEATHER_LUT_NORMAL = _weather_lut(config.CFG.weather_curve)
+    _WEATHER_LUT_HOLIDAY = _weather_lut(config.CFG.holiday_weather_curve)
+
 
+_WEATHER_LUT_NORMAL = _weather_lut(config.CFG.weather_curve)
+_WEATHER_LUT_HOLIDAY = _weather_lut(config.CFG.holiday_weather_curve)
 
-def calculate_trajectory(temp_history: List[Tuple[str, float]], lookback_readings: int = 12) -> Tuple[float, str]:
+
+def reload_config() -> None:
+    """
+    Re-resolve all config-derived state after modifying CONFIG (e.g. in tests).
+    
+    Rebuilds the config snapshots (config.invalidate_config_cache()), the DHW guard
+    settings and the weather curve tables.
+    """
+    global _DHW_CFG
+    invalidate_config_cache()
+    _DHW_CFG = _build_dhw_cfg()
+    clear_weather_curve_cache()
+
+
+def get_weather_curve(outdoor_temp: float, weather_curve_config=None) -> Tuple[int, float, int]:
+    """
+    Get min, reference, and max flow for given outdoor temperature.
+    Uses linear interpolation between anchors, precomputed at 0.1°C resolution.
+    
+    Args:
+        outdoor_temp: Outdoor temperature (°C)
+        weather_curve_config: Optional weather curve - config.WeatherCurve or a dict with "anchors"
+            (defaults to the normal-mode curve)
+    
+    Returns:
+        (min_flow, reference_flow, max_flow) in °C - min/max as whole degrees
+    """
+    if weather_curve_config is None:
+        lut = _WEATHER_LUT_NORMAL
+    else:
+        lut = _weather_lut(weather_curve_config)
+    return _weather_lut_lookup(lut, outdoor_temp)
+
+
+@dataclass
+class TempHistory:
+    """
+    Temperature history stored as parallel arrays (structure of arrays).
+    
+    Temperatures live in a contiguous float64 array so the trajectory regression
+    reads them directly; timestamps are kept alongside only for logging/state.
+    """
+    ts: Deque[str]
+    vals: array
+    maxlen: int = 36
+    
+    @classmethod
+    def from_pairs(cls, pairs: Optional[Iterable[Tuple[str, float]]], maxlen: int = 36) -> "TempHistory":
+        """Build history from (timestamp, temperature) pairs, keeping the last maxlen."""
+        if not isinstance(pairs, (list, tuple)):
+            pairs = list(pairs or ())
+        # Single slice, and only when over the limit (steady state: exactly maxlen+1 after a CSV append)
+        start = max(0, len(pairs) - max(0, maxlen))
+        if start:
+            pairs = pairs[start:]
+        return cls(
+            ts=deque((p[0] for p in pairs), maxlen=maxlen),
+            vals=array("d", (p[1] for p in pairs)),
+            maxlen=maxlen,
+        )
+    
+    def append(self, timestamp: str, temperature: float) -> None:
+        """Append a reading, evicting the oldest when full."""
+        self.ts.append(timestamp)
+        self.vals.append(temperature)
+        if len(self.vals) > self.maxlen:
+            del self.vals[0]
+    
+    def pairs(self) -> List[Tuple[str, float]]:
+        """Materialize as a list of (timestamp, temperature) tuples."""
+        return list(zip(self.ts, self.vals))
+    
+    def __len__(self) -> int:
+        return len(self.vals)
+
+
+def calculate_trajectory(temp_history: TempHistory, lookback_readings: int = 12) -> Tuple[float, str]:
     """
     Calculate temperature trajectory using linear regression over last N readings.
     
     Args:
-        temp_history: List of (timestamp, temperature) tuples
+        temp_history: TempHistory (or a sequence of (timestamp, temperature) tuples)
         lookback_readings: Number of readings to analyze (default 12 = 2 hours)
     
     Returns:
@@ -85,20 +270,24 @@ def calculate_trajectory(temp_history: List[Tuple[str, float]], lookback_reading
         return (0.0, "insufficient_data")
     
     # Use last N readings
-    recent = temp_history[-lookback_readings:] if len(temp_history) >= lookback_readings else temp_history
+    start = max(0, len(temp_history) - lookback_readings)
+    if isinstance(temp_history, TempHistory):
+        # Temperatures (contiguous float64); no copy when the buffer is the window
+        y_vals = temp_history.vals[start:] if start else temp_history.vals
+    else:
+        y_vals = [t[1] for t in islice(temp_history, start, None)]
     
-    if len(recent) < 3:
+    if len(y_vals) < 3:
         return (0.0, "insufficient_data")
     
-    # Linear regression
-    n = len(recent)
-    x_vals = list(range(n))  # Time indices
-    y_vals = [t[1] for t in recent]  # Temperatures
+    # Linear regression over time indices x = 0..n-1
+    n = len(y_vals)
     
-    sum_x = sum(x_vals)
+    # x is always range(n), so its sums are closed-form (exact integers)
+    sum_x = n * (n - 1) // 2
+    sum_x2 = (n - 1) * n * (2 * n - 1) // 6
     sum_y = sum(y_vals)
-    sum_xy = sum(x * y for x, y in zip(x_vals, y_vals))
-    sum_x2 = sum(x * x for x in x_vals)
+    sum_xy = sum(map(mul, range(n), y_vals))
     
     denominator = n * sum_x2 - sum_x * sum_x
     if abs(denominator) < 1e-10:
@@ -114,43 +303,186 @@ def calculate_trajectory(temp_history: List[Tuple[str, float]], lookback_reading
 
 
 def update_temp_history(
-    temp_history: List[Tuple[str, float]],
+    temp_history: Optional[TempHistory],
     timestamp: str,
     temperature: float,
     max_readings: int = 36  # 6 hours of history
-) -> List[Tuple[str, float]]:
+) -> TempHistory:
     """
     Update temperature history with new reading, keeping last max_readings.
     
+    Appends in place when temp_history is already a TempHistory with
+    maxlen=max_readings; any other sequence of (timestamp, temperature) pairs is
+    converted once.
+    
     Args:
-        temp_history: Current history
+        temp_history: Current history (TempHistory, list of pairs, or None)
         timestamp: ISO timestamp string
         temperature: Temperature reading (°C)
         max_readings: Maximum readings to keep
     
     Returns:
-        Updated history list
+        Updated history
     """
-    updated = temp_history + [(timestamp, temperature)]
+    if not isinstance(temp_history, TempHistory):
+        temp_history = TempHistory.from_pairs(temp_history, maxlen=max_readings)
+    elif temp_history.maxlen != max_readings:
+        temp_history = TempHistory.from_pairs(temp_history.pairs(), maxlen=max_readings)
+    
+    temp_history.append(timestamp, temperature)
+    return temp_history
+
+
+# Decision core result codes (mapped back to zone names / comments by the wrapper)
+_ZONE_STABLE, _ZONE_NORMAL = 0, 1
+_ZONE_NAMES = ("STABLE", "NORMAL")
+
+(_ACT_HOLD, _ACT_FORCE_ON, _ACT_TURN_ON, _ACT_HOLD_OFF,
+ _ACT_STEP_UP, _ACT_STEP_DOWN, _ACT_TURN_OFF, _ACT_RESET) = range(8)
+_ACTION_COMMENTS = {
+    _ACT_HOLD: "Hold",
+    _ACT_TURN_ON: "Turn ON (28°C)",
+    _ACT_HOLD_OFF: "Hold OFF",
+    _ACT_TURN_OFF: "Turn OFF",
+    _ACT_RESET: "Reset to reference",
+}
+
+# Predicted error dead band for choosing a step direction (°C)
+_PRED_DEADBAND = 0.05
+
+# Prediction horizon (hours) - accounts for floor heating thermal lag
+_LOOKAHEAD_HOURS = 2.0
+
+
+class _LazyComment:
+    """Decision comment that is only formatted when converted to str (e.g. CSV/log output)."""
+    __slots__ = ("_fn", "_v")
+    
+    def __init__(self, fn: Callable[[], str]):
+        self._fn = fn
+        self._v = None
+    
+    def __str__(self) -> str:
+        if self._v is None:
+            self._v = self._fn()
+        return self._v
+    
+    def __repr__(self) -> str:
+        return repr(str(self))
+
+
+def _decide_core(
+    current_error: float,
+    predicted_error: float,
+    last_flow: float,
+    min_flow: int,
+    ref_flow: float,
+    max_flow: int,
+    off: float,
+    min_on: float,
+    max_cap: float,
+    stable_err: float,
+    stable_pred_err: float,
+    max_step: float,
+) -> Tuple[float, float, int, int, int, float]:
+    """
+    Numeric core of the hourly decision: zones, single step, weather curve and limits.
+    
+    Pure scalar arithmetic with no config lookups or string building, so it can be
+    reused for bulk evaluation; hourly_rhythm_decision() builds the comment.
+    
+    Returns:
+        (new_flow, adjustment, zone_code, direction, action_code, step_flow)
+        - step_flow: flow after the single-step logic, before weather/limit clamping
+    """
+    # ===== ZONE 1: STABLE =====
+    # Perfect or near-perfect - hold current flow
+    # Both comparisons are always evaluated (bitwise &) so there is a single branch on the result
+    stable = (abs(current_error) <= stable_err) & (abs(predicted_error) <= stable_pred_err)
+    if stable:
+        # Even in STABLE, enforce weather minimum if currently OFF
+        # Only force ON if weather min >= heat pump minimum (28°C)
+        if last_flow == off and min_flow >= min_on:
+            new_flow = max(min_on, min_flow)
+            adjustment = new_flow - last_flow
+            # Enforce limits before returning
+            new_flow = max(off, min(max_cap, new_flow))
+            return (new_flow, adjustment, _ZONE_STABLE, 0, _ACT_FORCE_ON, new_flow)
+        
+        # Otherwise hold, but enforce limits (e.g., if switching from normal to holiday mode)
+        new_flow = max(off, min(max_cap, last_flow))
+        return (new_flow, new_flow - last_flow, _ZONE_STABLE, 0, _ACT_HOLD, new_flow)
+    
+    # ===== ZONE 2: NORMAL (Single-step changes) =====
+    # Determine desired direction based on predicted error
+    if predicted_error > _PRED_DEADBAND:
+        direction = 1    # Predicting too cold → need more heat
+    elif predicted_error < -_PRED_DEADBAND:
+        direction = -1   # Predicting too hot → need less heat
+    else:
+        direction = 0    # Predicted error is small
     
-    # Keep only last max_readings
-    if len(updated) > max_readings:
-        updated = updated[-max_readings:]
+    # Calculate new flow with single-step limit
+    if last_flow == off:
+        # Currently OFF
+        if direction > 0:
+            # Need heat: turn ON at minimum
+            new_flow = min_on
+            adjustment = new_flow - last_flow
+            action = _ACT_TURN_ON
+        else:
+            # Stay OFF
+            new_flow = off
+            adjustment = 0
+            action = _ACT_HOLD_OFF
+    elif last_flow >= min_on:
+        # Currently ON
+        if direction > 0:
+            # Need more heat: +1°C (capped at max_flow)
+            new_flow = min(last_flow + max_step, max_flow)
+            action = _ACT_STEP_UP
+        elif direction < 0:
+            # Need less heat: -1°C (single step)
+            new_flow = last_flow - max_step
+            action = _ACT_STEP_DOWN
+            
+            # If would go below HP minimum (28°C), turn OFF (single step: 28→20)
+            if new_flow < min_on:
+                new_flow = off
+                action = _ACT_TURN_OFF
+        else:
+            # Hold current
+            new_flow = last_flow
+            action = _ACT_HOLD
+        adjustment = new_flow - last_flow
+    else:
+        # Unexpected state: default to reference
+        new_flow = ref_flow
+        adjustment = new_flow - last_flow
+        action = _ACT_RESET
+    
+    # ===== ENFORCE WEATHER CURVE MIN/MAX + FINAL LIMITS =====
+    # Branchless clamp: if weather requires heat (min_flow >= 28°C) the floor is
+    # min_flow (never below HP minimum), otherwise OFF is allowed. Cap at the
+    # weather max, then at the absolute limits.
+    effective_min = max(min_on, min_flow) if min_flow >= min_on else off
+    step_flow = new_flow
+    new_flow = max(off, min(max_cap, min(max_flow, max(effective_min, step_flow))))
     
-    return updated
+    return (new_flow, adjustment, _ZONE_NORMAL, direction, action, step_flow)
 
 
 def hourly_rhythm_decision(
-    outdoor_ema: float,
     outdoor_temp: float,
     avg_temp: float,
     setpoint: float,
     trajectory_slope: float,
-    traj_status: str,
     last_flow: float,
     dhw_active: bool,
     use_holiday_mode: bool = False,
-) -> Tuple[float, float, float, float, float, str, str]:
+    *,
+    outdoor_ema: Optional[float] = None,
+) -> Tuple[float, float, float, float, float, str, "_LazyComment"]:
     """
     V5.6 Simplified Control Decision with Holiday Mode Support.
     
@@ -169,168 +501,131 @@ def hourly_rhythm_decision(
     - Symmetric response for warming and cooling
     
     Args:
-        outdoor_ema: Smoothed outdoor temperature (°C) - used for display/logging
         outdoor_temp: Raw outdoor temperature (°C) - used for weather curve calculation (v5.2)
         avg_temp: Current weighted average room temperature (°C)
         setpoint: Target room temperature (°C)
         trajectory_slope: Temperature change rate (°C/hour)
-        traj_status: Trajectory calculation status
         last_flow: Last APPLIED flow from XX:00 timestamp (°C)
         dhw_active: Whether DHW heating is active
         use_holiday_mode: If True, use holiday mode configs (default: False)
+        outdoor_ema: Smoothed outdoor temperature (°C) - keyword-only, used in the comment
+            only (falls back to outdoor_temp)
     
     Returns:
         (flow_cmd, predicted_temp, predicted_error, reference_flow, adjustment, decision_zone, comment)
+        - comment: lazily built; use str(comment) to get the text
     """
     # Get configuration (use mode-specific configs if holiday mode is enabled)
-    # Note: use_holiday_mode is a boolean (True/False), but config uses 1/0
-    if use_holiday_mode:
-        zones = CONFIG.get("holiday_control_zones", CONFIG["control_zones"])
-        limits = CONFIG.get("holiday_flow_limits", CONFIG["flow_limits"])
-        weather_curve_config = CONFIG.get("holiday_weather_curve", CONFIG["weather_curve"])
-    else:
-        zones = CONFIG["control_zones"]
-        limits = CONFIG["flow_limits"]
-        weather_curve_config = CONFIG["weather_curve"]
-    
-    pred_config = CONFIG["prediction"]
-    app_config = CONFIG["application"]
+    cfg = resolved_config(use_holiday_mode)
     
     # Get weather curve min/ref/max (v5.2: use raw outdoor_temp for faster response)
-    min_flow, ref_flow, max_flow = get_weather_curve(outdoor_temp, weather_curve_config)
+    min_flow, ref_flow, max_flow = get_weather_curve(outdoor_temp, cfg.weather_curve)
     
     # Calculate errors
     current_error = setpoint - avg_temp
     
     # Predict future temperature (2 hours ahead to account for thermal lag)
-    lookahead_hours = 2.0
-    predicted_temp = avg_temp + (trajectory_slope * lookahead_hours)
+    predicted_temp = avg_temp + (trajectory_slope * _LOOKAHEAD_HOURS)
     predicted_error = setpoint - predicted_temp
     
-    # Initialize
-    adjustment = 0
-    decision_zone = "NORMAL"
-    comment_parts = []
-    
-    # ===== ZONE 1: STABLE =====
-    # Perfect or near-perfect - hold current flow
-    if (abs(current_error) <= zones["stable_error"] and 
-        abs(predicted_error) <= zones["stable_pred_error"]):
-        decision_zone = "STABLE"
-        comment_parts.append("Stable near target")
-        
-        # Even in STABLE, enforce weather minimum if currently OFF
-        # Only force ON if weather min >= heat pump minimum (28°C)
-        if last_flow == limits["off"] and min_flow >= limits["min_on"]:
-            new_flow = max(limits["min_on"], int(min_flow))
-            adjustment = new_flow - last_flow
-            comment_parts.append(f"but weather min={int(min_flow)}°C at {fmt1(outdoor_ema)}°C - forcing ON")
-            # Enforce limits before returning
-            new_flow = max(limits["off"], min(limits["max"], new_flow))
-            return (int(new_flow), predicted_temp, predicted_error, ref_flow, adjustment, decision_zone, "; ".join(comment_parts))
-        
-        # Otherwise hold, but enforce limits (e.g., if switching from normal to holiday mode)
-        new_flow = max(limits["off"], min(limits["max"], last_flow))
-        if new_flow != last_flow:
-            comment_parts.append(f"capped at limit={int(new_flow)}°C")
-        return (int(new_flow), predicted_temp, predicted_error, ref_flow, new_flow - last_flow, decision_zone, "; ".join(comment_parts))
-    
-    # ===== ZONE 2: NORMAL (Single-step changes) =====
-    # Everything else - single-step based on trajectory
-    # Determine desired direction based on predicted error
-    if predicted_error > 0.05:
-        # Predicting too cold → need more heat
-        direction = +1
-        comment_parts.append(f"Pred cold ({fmt2(predicted_error)}°C)")
-    elif predicted_error < -0.05:
-        # Predicting too hot → need less heat
-        direction = -1
-        comment_parts.append(f"Pred hot ({fmt2(predicted_error)}°C)")
-    else:
-        # Predicted error is small
-        direction = 0
-        comment_parts.append("Pred stable")
-    
-    # Calculate new flow with single-step limit
-    max_step = app_config["max_step_per_hour"]
-    
-    if last_flow == limits["off"]:
-        # Currently OFF
-        if direction > 0:
-            # Need heat: turn ON at minimum
-            new_flow = limits["min_on"]
-            adjustment = new_flow - last_flow
-            comment_parts.append("Turn ON (28°C)")
+    # ===== DECISION (zones, single step, weather curve, limits) =====
+    new_flow, adjustment, zone, direction, action, step_flow = _decide_core(
+        current_error, predicted_error, last_flow,
+        min_flow, ref_flow, max_flow,
+        cfg.off, cfg.min_on, cfg.max_cap,
+        cfg.stable_err, cfg.stable_pred_err, cfg.max_step,
+    )
+    
+    # ===== COMMENT (built lazily, only when stringified) =====
+    def build_comment() -> str:
+        comment_parts = []
+        if zone == _ZONE_STABLE:
+            comment_parts.append("Stable near target")
+            if action == _ACT_FORCE_ON:
+                comment_parts.append(f"but weather min={min_flow}°C at {fmt1(outdoor_temp if outdoor_ema is None else outdoor_ema)}°C - forcing ON")
+            elif new_flow != last_flow:
+                comment_parts.append(f"capped at limit={int(new_flow)}°C")
         else:
-            # Stay OFF
-            new_flow = limits["off"]
-            adjustment = 0
-            comment_parts.append("Hold OFF")
-    elif last_flow >= limits["min_on"]:
-        # Currently ON
-        if direction > 0:
-            # Need more heat: +1°C (capped at max_flow)
-            new_flow = min(last_flow + max_step, max_flow)
-            adjustment = new_flow - last_flow
-            comment_parts.append(f"+{int(adjustment)}°C")
-        elif direction < 0:
-            # Need less heat: -1°C (single step)
-            new_flow = last_flow - max_step
-            
-            # If would go below HP minimum (28°C), turn OFF (single step: 28→20)
-            if new_flow < limits["min_on"]:
-                new_flow = limits["off"]
-                comment_parts.append("Turn OFF")
+            if direction > 0:
+                comment_parts.append(f"Pred cold ({fmt2(predicted_error)}°C)")
+            elif direction < 0:
+                comment_parts.append(f"Pred hot ({fmt2(predicted_error)}°C)")
             else:
-                comment_parts.append(f"-{int(max_step)}°C")
-            adjustment = new_flow - last_flow
-        else:
-            # Hold current
-            new_flow = last_flow
-            adjustment = 0
-            comment_parts.append("Hold")
-    else:
-        # Unexpected state: default to reference
-        new_flow = ref_flow
-        adjustment = new_flow - last_flow
-        comment_parts.append("Reset to reference")
-    
-    # ===== ENFORCE WEATHER CURVE MIN/MAX =====
-    # Enforce weather curve constraints on the calculated flow
-    
-    # 1. Enforce minimum: If below min_flow and min_flow requires heat, hold at min_flow
-    if new_flow < min_flow and min_flow > limits["off"]:
-        if min_flow >= limits["min_on"]:
-            # Weather requires heat (min_flow >= 28°C) - hold at min_flow
-            new_flow = max(limits["min_on"], int(min_flow))
-            comment_parts.append(f"Weather min={int(min_flow)}°C enforced")
-        # If min_flow < 28°C, OFF is allowed, so no change needed
+                comment_parts.append("Pred stable")
+        
+            if action == _ACT_STEP_UP:
+                comment_parts.append(f"+{int(adjustment)}°C")
+            elif action == _ACT_STEP_DOWN:
+                comment_parts.append(f"-{int(cfg.max_step)}°C")
+            else:
+                comment_parts.append(_ACTION_COMMENTS[action])
+        
+            # Weather curve enforcement (post-hoc: compare against the pre-clamp step)
+            if new_flow > step_flow:
+                comment_parts.append(f"Weather min={min_flow}°C enforced")
+            elif step_flow > max_flow:
+                comment_parts.append(f"Weather max={max_flow}°C enforced")
+        
+        return "; ".join(comment_parts)
     
-    # 2. Enforce maximum: Cap at max_flow
-    if new_flow > max_flow:
-        new_flow = int(max_flow)
-        comment_parts.append(f"Weather max={int(max_flow)}°C enforced")
+    return (int(new_flow), predicted_temp, predicted_error, ref_flow, adjustment, _ZONE_NAMES[zone], _LazyComment(build_comment))
+
+
+def hourly_rhythm_decision_batch(
+    outdoor_temps: Sequence[float],
+    avg_temps: Sequence[float],
+    setpoint: float,
+    trajectory_slopes: Sequence[float],
+    last_flows: Sequence[float],
+    use_holiday_mode: bool = False,
+) -> List[Tuple[int, float, float, float, float, str]]:
+    """
+    Evaluate the hourly decision for many rows at once (e.g. backtesting heating_log.csv).
     
-    # 3. If OFF but weather requires heat, force ON
-    if new_flow == limits["off"] and min_flow >= limits["min_on"]:
-        new_flow = max(limits["min_on"], int(min_flow))
-        adjustment = new_flow - limits["off"]
-        comment_parts.append(f"Weather min={int(min_flow)}°C at {fmt1(outdoor_temp)}°C - forcing ON")
+    Same decision as hourly_rhythm_decision() per row, but config and weather curve
+    tables are resolved once for the whole batch and no comment strings are built.
+    Rows are independent: each row's last_flow is taken from last_flows as given.
     
-    # ===== FINAL LIMITS =====
-    # Ensure within absolute limits
-    new_flow = max(limits["off"], min(limits["max"], new_flow))
+    Args:
+        outdoor_temps: Raw outdoor temperatures (°C), one per row
+        avg_temps: Weighted average room temperatures (°C)
+        setpoint: Target room temperature (°C), shared by all rows
+        trajectory_slopes: Temperature change rates (°C/hour)
+        last_flows: Last APPLIED flows (°C)
+        use_holiday_mode: If True, use holiday mode configs (default: False)
     
-    return (int(new_flow), predicted_temp, predicted_error, ref_flow, adjustment, decision_zone, "; ".join(comment_parts))
+    Returns:
+        List of (flow_cmd, predicted_temp, predicted_error, reference_flow, adjustment, decision_zone)
+    """
+    cfg = resolved_config(use_holiday_mode)
+    lut = _weather_lut(cfg.weather_curve)
+    off, min_on, max_cap = cfg.off, cfg.min_on, cfg.max_cap
+    stable_err, stable_pred_err, max_step = cfg.stable_err, cfg.stable_pred_err, cfg.max_step
+    
+    results = []
+    for outdoor_temp, avg_temp, slope, last_flow in zip(outdoor_temps, avg_temps, trajectory_slopes, last_flows):
+        min_flow, ref_flow, max_flow = _weather_lut_lookup(lut, outdoor_temp)
+        predicted_temp = avg_temp + (slope * _LOOKAHEAD_HOURS)
+        predicted_error = setpoint - predicted_temp
+        
+        new_flow, adjustment, zone, _, _, _ = _decide_core(
+            setpoint - avg_temp, predicted_error, last_flow,
+            min_flow, ref_flow, max_flow,
+            off, min_on, max_cap,
+            stable_err, stable_pred_err, max_step,
+        )
+        results.append((int(new_flow), predicted_temp, predicted_error, ref_flow, adjustment, _ZONE_NAMES[zone]))
+    
+    return results
 
 
-# Keep check_dhw_guard function unchanged (it's still needed)
+# DHW guard (temp rise detection with safety timeout)
 def check_dhw_guard(
     tank_current: Optional[float],
     prev_tank_temp: Optional[float],
-    prev_dhw_start_time: Optional[str],
+    prev_dhw_start_time: Optional[int],
     current_time,
-) -> Tuple[bool, Optional[str]]:
+) -> Tuple[bool, Optional[int]]:
     """
     Check if DHW (Domestic Hot Water) heating cycle is active.
     Uses only temp_rise_threshold method.
@@ -339,17 +634,15 @@ def check_dhw_guard(
     Args:
         tank_current: Current tank temperature (°C)
         prev_tank_temp: Previous tank temperature (°C)
-        prev_dhw_start_time: ISO timestamp string when DHW started (or None)
+        prev_dhw_start_time: Unix timestamp (seconds) when DHW started (or None)
         current_time: Current datetime object
     
     Returns:
         (dhw_active, dhw_start_time)
         - dhw_active: True if DHW heating detected
-        - dhw_start_time: ISO timestamp string of DHW start (or None)
+        - dhw_start_time: Unix timestamp (seconds) of DHW start (or None)
     """
-    config = CONFIG["dhw_guard"]
-    
-    if not config["enable"]:
+    if not _DHW_CFG.enable:
         return (False, None)
     
     if tank_current is None or prev_tank_temp is None:
@@ -358,29 +651,19 @@ def check_dhw_guard(
     temp_rise = tank_current - prev_tank_temp
     
     # Check for DHW start (temp rising significantly)
-    if temp_rise >= config["temp_rise_threshold"]:
+    if temp_rise >= _DHW_CFG.rise:
         # DHW heating detected
         if prev_dhw_start_time is None:
             # Just started
-            dhw_start_time = current_time.isoformat()
-            return (True, dhw_start_time)
-        else:
-            # Already active - check timeout
-            try:
-                from datetime import datetime
-                start_dt = datetime.fromisoformat(prev_dhw_start_time)
-                elapsed_minutes = (current_time - start_dt).total_seconds() / 60
-                
-                if elapsed_minutes > config["timeout_minutes"]:
-                    # Timeout reached - force DHW off
-                    return (False, None)
-                else:
-                    # Still within timeout - keep active
-                    return (True, prev_dhw_start_time)
-            except Exception:
-                # Parse error - assume active
-                return (True, prev_dhw_start_time)
+            return (True, int(current_time.timestamp()))
+        
+        # Already active - check timeout
+        if int(current_time.timestamp()) - prev_dhw_start_time > _DHW_CFG.timeout_s:
+            # Timeout reached - force DHW off
+            return (False, None)
+        
+        # Still within timeout - keep active
+        return (True, prev_dhw_start_time)
     else:
         # Temp not rising - DHW ended
         return (False, None)
-
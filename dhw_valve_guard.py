@@ -10,18 +10,23 @@ from entering the pipes and causing noise. Restores original temps when DHW fini
 Integrated into main controller - runs every 10 minutes.
 """
 
-import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 
 from lk_systems import get_lk_temperatures_with_targets, set_lk_temperature
-from utils import log
+from utils import log, json_loads, json_dumps_pretty
 from config import CONFIG
 
 # Configuration
 STATE_FILE = Path("./dhw_valve_state.json")
 GUARD_TEMP = 20.0  # Temperature to set during DHW cycle
+MAX_PARALLEL_WRITES = 8  # Concurrent LK setpoint requests
+
+# Last state read/written, keyed by the file's mtime (re-read only when the file changes)
+_STATE_CACHE = {"mtime_ns": None, "data": None}
 
 
 def log_dhw(message: str):
@@ -30,84 +35,142 @@ def log_dhw(message: str):
 
 
 def read_state() -> Optional[Dict]:
-    """Read the current valve guard state from file."""
-    if not STATE_FILE.exists():
+    """Read the current valve guard state from file (cached until the file's mtime changes)."""
+    try:
+        mtime_ns = STATE_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        _STATE_CACHE["mtime_ns"] = _STATE_CACHE["data"] = None
         return None
+    except OSError as e:
+        log_dhw(f"Failed to read state file: {e}")
+        return None
+    
+    if _STATE_CACHE["mtime_ns"] == mtime_ns:
+        return _STATE_CACHE["data"]
     
     try:
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(STATE_FILE, "rb") as f:
+            data = json_loads(f.read())
     except Exception as e:
         log_dhw(f"Failed to read state file: {e}")
         return None
+    
+    _STATE_CACHE["mtime_ns"], _STATE_CACHE["data"] = mtime_ns, data
+    return data
 
 
 def write_state(state: Dict):
-    """Write valve guard state to file."""
+    """
+    Write valve guard state to file and keep it as the cached state.
+    
+    Written to a temp file, fsynced, then renamed over STATE_FILE so a killed
+    run can never leave a truncated state file behind.
+    """
+    tmp_file = STATE_FILE.with_suffix(".json.tmp")
     try:
-        with open(STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump(state, f, indent=2, ensure_ascii=False)
+        with open(tmp_file, "wb") as f:
+            f.write(json_dumps_pretty(state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, STATE_FILE)
+        _STATE_CACHE["mtime_ns"], _STATE_CACHE["data"] = STATE_FILE.stat().st_mtime_ns, state
     except Exception as e:
+        _STATE_CACHE["mtime_ns"] = _STATE_CACHE["data"] = None
         log_dhw(f"ERROR: Failed to write state file: {e}")
 
 
-def backup_and_close_valves():
-    """Set Plan 2 rooms to 20°C and backup original temps."""
+def set_temperatures(targets: List[Tuple[int, float]]) -> List[bool]:
+    """
+    Set several room setpoints concurrently (I/O bound, shared LK session).
+    
+    Args:
+        targets: List of (room_id, target_temp)
+    
+    Returns:
+        Success flag per target, in the same order
+    """
+    if not targets:
+        return []
+    
     creds = CONFIG["credentials"]
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_WRITES, len(targets))) as pool:
+        futures = [
+            pool.submit(set_lk_temperature, room_id, temp, creds["lk_email"], creds["lk_password"])
+            for room_id, temp in targets
+        ]
+        return [f.result() for f in futures]
+
+
+def _fetch_plan2_rooms() -> List[Dict]:
+    """Get Plan 2 rooms with current targets (case-insensitive; other rooms skipped while parsing)."""
+    creds = CONFIG["credentials"]
+    return get_lk_temperatures_with_targets(
+        creds["lk_email"], creds["lk_password"],
+        plan_filter=lambda plan: "plan 2" in plan.lower(),
+    )
+
+
+def _apply_targets(changes: List[Tuple[int, str, Optional[float], float]], fail_text: str) -> List[Optional[bool]]:
+    """
+    Write room setpoints (in parallel), skipping rooms already at their target.
+    
+    Args:
+        changes: List of (room_id, room_name, current_temp or None if unknown, target_temp)
+        fail_text: Log text for a failed write (e.g. "FAILED to restore")
+    
+    Returns:
+        Per change: None if skipped, otherwise whether the write succeeded
+    """
+    outcome: List[Optional[bool]] = [None] * len(changes)
+    to_write = []
+    for i, (room_id, room_name, current, target) in enumerate(changes):
+        if current is not None and abs(current - target) < 0.1:
+            log_dhw(f"  {room_name} (ID {room_id}): Already at {target:.1f}°C, skipping")
+        else:
+            to_write.append(i)
     
+    results = set_temperatures([(changes[i][0], changes[i][3]) for i in to_write])
+    
+    for i, ok in zip(to_write, results):
+        room_id, room_name, current, target = changes[i]
+        if ok:
+            log_dhw(f"  {room_name} (ID {room_id}): {GUARD_TEMP if current is None else current:.1f}°C → {target:.1f}°C ✓")
+        else:
+            log_dhw(f"  {room_name} (ID {room_id}): {fail_text}")
+        outcome[i] = ok
+    return outcome
+
+
+def backup_and_close_valves():
+    """Set Plan 2 rooms to 20°C and backup original temps."""
     try:
         log_dhw("=== DHW DETECTED: Closing Plan 2 valves ===")
         
-        # Get all room temperatures with targets
-        rooms = get_lk_temperatures_with_targets(creds["lk_email"], creds["lk_password"])
-        log_dhw(f"Retrieved {len(rooms)} rooms")
-        
-        # Filter Plan 2 rooms (case-insensitive)
-        plan2_rooms = [
-            r for r in rooms 
-            if "plan 2" in r.get("plan", "").lower()
-        ]
+        plan2_rooms = _fetch_plan2_rooms()
         log_dhw(f"Found {len(plan2_rooms)} Plan 2 rooms")
         
         if not plan2_rooms:
             log_dhw("WARNING: No Plan 2 rooms found!")
             return
         
-        # Create backup state
+        # Set to guard temp; back up the original temp of every room that was not already there
+        outcome = _apply_targets(
+            [(r["id"], r["name"], r["target_temp"], GUARD_TEMP) for r in plan2_rooms],
+            "FAILED to set temperature",
+        )
         backup_state = {
             "active": True,
             "start_time": datetime.now().isoformat(),
-            "rooms": {}
+            "rooms": {
+                str(r["id"]): {"name": r["name"], "original_temp": r["target_temp"]}
+                for r, ok in zip(plan2_rooms, outcome)
+                if ok is not None
+            },
         }
         
-        # Set each Plan 2 room to 20°C
-        success_count = 0
-        for room in plan2_rooms:
-            room_id = room["id"]
-            original_temp = room["target_temp"]
-            room_name = room["name"]
-            
-            # Skip if already at guard temp
-            if abs(original_temp - GUARD_TEMP) < 0.1:
-                log_dhw(f"  {room_name} (ID {room_id}): Already at {GUARD_TEMP}°C, skipping")
-                continue
-            
-            # Backup original temperature
-            backup_state["rooms"][str(room_id)] = {
-                "name": room_name,
-                "original_temp": original_temp,
-            }
-            
-            # Set to guard temp
-            if set_lk_temperature(room_id, GUARD_TEMP, creds["lk_email"], creds["lk_password"]):
-                log_dhw(f"  {room_name} (ID {room_id}): {original_temp:.1f}°C → {GUARD_TEMP}°C ✓")
-                success_count += 1
-            else:
-                log_dhw(f"  {room_name} (ID {room_id}): FAILED to set temperature")
-        
         # Save state
         write_state(backup_state)
-        log_dhw(f"Successfully closed {success_count}/{len(plan2_rooms)} valves")
+        log_dhw(f"Successfully closed {outcome.count(True)}/{len(plan2_rooms)} valves")
         log_dhw("=== VALVE GUARD ACTIVATED ===")
         
     except Exception as e:
@@ -116,7 +179,6 @@ def backup_and_close_valves():
 
 def restore_valves():
     """Restore Plan 2 rooms to original temperatures."""
-    creds = CONFIG["credentials"]
     state = read_state()
     
     if not state or not state.get("active"):
@@ -129,20 +191,22 @@ def restore_valves():
         start_time = state.get("start_time", "Unknown")
         log_dhw(f"Restoring from guard started at: {start_time}")
         
-        # Restore each room
-        success_count = 0
-        for room_id_str, room_data in state["rooms"].items():
-            room_id = int(room_id_str)
-            original_temp = room_data["original_temp"]
-            room_name = room_data["name"]
-            
-            if set_lk_temperature(room_id, original_temp, creds["lk_email"], creds["lk_password"]):
-                log_dhw(f"  {room_name} (ID {room_id}): {GUARD_TEMP}°C → {original_temp:.1f}°C ✓")
-                success_count += 1
-            else:
-                log_dhw(f"  {room_name} (ID {room_id}): FAILED to restore")
+        # Current setpoints (one batched read) so rooms already at their original temp are not rewritten
+        try:
+            current_targets = {r["id"]: r["target_temp"] for r in _fetch_plan2_rooms()}
+        except Exception as e:
+            log_dhw(f"Could not read current setpoints, restoring all rooms: {e}")
+            current_targets = {}
         
-        log_dhw(f"Successfully restored {success_count}/{len(state['rooms'])} valves")
+        outcome = _apply_targets(
+            [
+                (int(room_id_str), room_data["name"], current_targets.get(int(room_id_str)), room_data["original_temp"])
+                for room_id_str, room_data in state["rooms"].items()
+            ],
+            "FAILED to restore",
+        )
+        restored = sum(1 for ok in outcome if ok is not False)  # Skipped rooms are already restored
+        log_dhw(f"Successfully restored {restored}/{len(state['rooms'])} valves")
         
         # Mark state as inactive
         state["active"] = False
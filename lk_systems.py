@@ -5,15 +5,49 @@
 LK Systems integration for reading room temperatures.
 """
 
+import hashlib
+import ssl
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import mul
 import requests
 import urllib3
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Callable, Dict, Any, List, Sequence, Set, Tuple, Optional
 
-from utils import log, fmt1
+from utils import log, json_loads
 from config import CONFIG
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Authenticated sessions are reused across calls until they expire or the API rejects them
+_SESSION_TTL_S = 300.0
+
+# (email, sha256(password)) -> (session, created monotonic time)
+_SESSION_CACHE: Dict[Tuple[str, str], Tuple[requests.Session, float]] = {}
+_SESSION_LOCK = threading.Lock()
+
+# Thermostat ids found by the last full tid=0..63 scan; later calls only query these
+_MAX_THERMOSTATS = 64
+_THERMOSTAT_IDS_TTL_S = 3600.0
+_THERMOSTAT_IDS: Optional[Tuple[Tuple[int, ...], float]] = None  # (ids, discovered monotonic time)
+_MAX_PARALLEL_FETCHES = 16  # Concurrent thermostat.json requests
+
+
+@lru_cache(maxsize=1)
+def _lk_ssl_context() -> ssl.SSLContext:
+    """Shared unverified SSL context (LK requests use verify=False), built once."""
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+class _LKAdapter(requests.adapters.HTTPAdapter):
+    """HTTPAdapter whose connection pools all reuse the shared LK SSL context."""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = _lk_ssl_context()
+        return super().init_poolmanager(*args, **kwargs)
 
 
 def _lk_login(email: str, password: str) -> requests.Session:
@@ -30,7 +64,16 @@ def _lk_login(email: str, password: str) -> requests.Session:
     Raises:
         RuntimeError: If login fails after retries
     """
+    # LK requests use verify=False; silence the warning only once LK is actually used
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    
     session = requests.Session()
+    # my.lk.nu is the only host: a single keep-alive pool with one connection per
+    # concurrent fetch worker, so TLS handshakes happen once per worker, not per request
+    session.mount(
+        "https://my.lk.nu",
+        _LKAdapter(pool_connections=1, pool_maxsize=_MAX_PARALLEL_FETCHES),
+    )
     network_config = CONFIG["network"]
     
     for attempt in range(1, network_config["retries"] + 1):
@@ -44,7 +87,7 @@ def _lk_login(email: str, password: str) -> requests.Session:
             if response.status_code != 200:
                 raise RuntimeError(f"LK login status {response.status_code}")
             
-            data = response.json()
+            data = json_loads(response.content)
             if "email" not in data or data["email"] != email:
                 raise RuntimeError("LK login invalid credentials")
             
@@ -68,9 +111,135 @@ def _lk_login(email: str, password: str) -> requests.Session:
     return session
 
 
+def _session_key(email: str, password: str) -> Tuple[str, str]:
+    """Cache key for an account (the password itself is not kept in the key)."""
+    return (email, hashlib.sha256(password.encode("utf-8")).hexdigest())
+
+
+def _get_session(email: str, password: str) -> requests.Session:
+    """
+    Get a cached authenticated session, logging in if none is cached or it has expired.
+    
+    Args:
+        email: LK Systems account email
+        password: LK Systems account password
+    
+    Returns:
+        Authenticated requests session (shared; do not close)
+    
+    Raises:
+        RuntimeError: If login fails after retries
+    """
+    key = _session_key(email, password)
+    with _SESSION_LOCK:
+        entry = _SESSION_CACHE.get(key)
+        if entry is not None:
+            session, created = entry
+            if time.monotonic() - created < _SESSION_TTL_S:
+                return session
+            session.close()
+            del _SESSION_CACHE[key]
+        
+        session = _lk_login(email, password)
+        _SESSION_CACHE[key] = (session, time.monotonic())
+        return session
+
+
+def _invalidate_session(email: str, password: str, session: requests.Session) -> None:
+    """Drop a rejected session from the cache (unless another caller already replaced it)."""
+    key = _session_key(email, password)
+    with _SESSION_LOCK:
+        entry = _SESSION_CACHE.get(key)
+        if entry is not None and entry[0] is session:
+            del _SESSION_CACHE[key]
+    session.close()
+
+
+def _lk_get(email: str, password: str, url: str) -> requests.Response:
+    """
+    GET an LK API URL with the cached session, re-logging in once on 401/403.
+    
+    Args:
+        email: LK Systems account email
+        password: LK Systems account password
+        url: Full request URL
+    
+    Returns:
+        Response object
+    """
+    timeout = CONFIG["network"]["timeout"]
+    session = _get_session(email, password)
+    response = session.get(url, verify=False, timeout=timeout)
+    if response.status_code in (401, 403):
+        _invalidate_session(email, password, session)
+        session = _get_session(email, password)
+        response = session.get(url, verify=False, timeout=timeout)
+    return response
+
+
+def _thermostat_ids() -> Tuple[Sequence[int], bool]:
+    """
+    Get the thermostat ids to query.
+    
+    Returns:
+        (ids, full_scan) - cached discovered ids if still fresh, otherwise all 64 ids
+    """
+    if _THERMOSTAT_IDS is not None:
+        ids, discovered = _THERMOSTAT_IDS
+        if time.monotonic() - discovered < _THERMOSTAT_IDS_TTL_S:
+            return ids, False
+    return range(_MAX_THERMOSTATS), True
+
+
+def _remember_thermostat_ids(found_ids: List[int], failed_ids: Set[int]) -> None:
+    """
+    Cache the ids of real thermostats found by a full scan.
+    
+    Ids whose request failed during the scan keep their previously cached state, so
+    one failed GET does not drop a thermostat until the next scan. Without a previous
+    cache such a scan is not remembered (the next call scans again).
+    """
+    global _THERMOSTAT_IDS
+    ids = set(found_ids)
+    if failed_ids:
+        if _THERMOSTAT_IDS is None:
+            return
+        ids.update(failed_ids.intersection(_THERMOSTAT_IDS[0]))
+    if ids:
+        _THERMOSTAT_IDS = (tuple(sorted(ids)), time.monotonic())
+
+
+def _fetch_thermostat(email: str, password: str, tid: int) -> Optional[Dict[str, Any]]:
+    """Fetch one thermostat.json payload, or None on any request/parse error."""
+    try:
+        return json_loads(_lk_get(email, password, f"https://my.lk.nu/thermostat.json?tid={tid}").content)
+    except Exception:
+        return None
+
+
+def _fetch_thermostats(email: str, password: str, tids: Sequence[int]) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    Fetch thermostat payloads concurrently over the shared session.
+    
+    Args:
+        email: LK Systems account email
+        password: LK Systems account password
+        tids: Thermostat ids to query
+    
+    Returns:
+        List of (tid, thermostat_data) in tid order, failed requests omitted
+    """
+    if not tids:
+        return []
+    with ThreadPoolExecutor(max_workers=min(_MAX_PARALLEL_FETCHES, len(tids))) as pool:
+        payloads = list(pool.map(lambda tid: _fetch_thermostat(email, password, tid), tids))
+    return [(tid, data) for tid, data in zip(tids, payloads) if data is not None]
+
+
+@lru_cache(maxsize=256)
 def _hex_to_str(hex_string: str) -> str:
     """
-    Decode hex string to UTF-8 or Latin-1.
+    Decode hex string to UTF-8 or Latin-1 (memoized: room/plan names rarely change).
     
     Args:
         hex_string: Hexadecimal string
@@ -89,153 +258,156 @@ def _hex_to_str(hex_string: str) -> str:
         return hex_string
 
 
-def get_lk_temperatures(email: str, password: str) -> List[Dict[str, Any]]:
+def get_lk_temperatures(
+    email: str,
+    password: str,
+    *,
+    plan_filter: Optional[Callable[[str], bool]] = None,
+) -> List[Dict[str, Any]]:
     """
     Fetch room temperatures from LK Systems.
     
     Args:
         email: LK Systems account email
         password: LK Systems account password
+        plan_filter: Optional predicate on the plan name; rooms it rejects are
+            skipped before their name is decoded
     
     Returns:
         List of room dictionaries with keys: id, name, temp, plan
     """
-    session = _lk_login(email, password)
+    _get_session(email, password)  # Login up front so auth failures raise to the caller
     rooms = []
-    network_config = CONFIG["network"]
     
+    # Get plan names
     try:
-        # Get plan names
+        main_response = _lk_get(email, password, "https://my.lk.nu/main.json")
+        main_data = json_loads(main_response.content)
+        plan_names = {
+            i: _hex_to_str(hex_name)
+            for i, hex_name in enumerate(main_data.get("sect_name", []))
+        }
+    except Exception:
+        plan_names = {}
+    
+    # Fetch each thermostat (only previously discovered ids once a full scan has run)
+    tids, full_scan = _thermostat_ids()
+    found_ids = []  # Real thermostats, including ones rejected by plan_filter
+    thermostats = _fetch_thermostats(email, password, tids)
+    for tid, thermostat_data in thermostats:
         try:
-            main_response = session.get(
-                "https://my.lk.nu/main.json",
-                verify=False,
-                timeout=network_config["timeout"],
+            if "get_room_deg" not in thermostat_data:
+                continue
+            
+            hex_name = thermostat_data.get("name", "")
+            if not hex_name or hex_name == "546865726D6F73746174":  # "Thermostat" in hex
+                continue
+            found_ids.append(tid)
+            
+            zones = thermostat_data.get("actuator_zone", [])
+            max_zone = max(map(int, zones), default=0)  # "0" = unused slot, never the max
+            plan = plan_names.get(
+                0 if max_zone <= 5 else 1,
+                f"Plan {1 if max_zone <= 5 else 2}",
             )
-            main_data = main_response.json()
-            plan_names = {
-                i: _hex_to_str(hex_name)
-                for i, hex_name in enumerate(main_data.get("sect_name", []))
-            }
-        except Exception:
-            plan_names = {}
-        
-        # Fetch each thermostat
-        for tid in range(64):
-            try:
-                thermostat_response = session.get(
-                    f"https://my.lk.nu/thermostat.json?tid={tid}",
-                    verify=False,
-                    timeout=network_config["timeout"],
-                )
-                thermostat_data = thermostat_response.json()
-                
-                if "get_room_deg" not in thermostat_data:
-                    continue
-                
-                hex_name = thermostat_data.get("name", "")
-                if not hex_name or hex_name == "546865726D6F73746174":  # "Thermostat" in hex
-                    continue
-                
-                name = _hex_to_str(hex_name)
-                zones = thermostat_data.get("actuator_zone", [])
-                max_zone = max([int(z) for z in zones if z != "0"], default=0)
-                plan = plan_names.get(
-                    0 if max_zone <= 5 else 1,
-                    f"Plan {1 if max_zone <= 5 else 2}",
-                )
-                temp = float(thermostat_data["get_room_deg"]) / 100.0
-                
-                rooms.append({
-                    "id": tid,
-                    "name": name,
-                    "temp": temp,
-                    "plan": plan,
-                })
-            except Exception:
+            if plan_filter is not None and not plan_filter(plan):
                 continue
+            
+            name = _hex_to_str(hex_name)
+            temp = float(thermostat_data["get_room_deg"]) / 100.0
+            
+            rooms.append({
+                "id": tid,
+                "name": name,
+                "temp": temp,
+                "plan": plan,
+            })
+        except Exception:
+            continue
     
-    finally:
-        session.close()
+    if full_scan:
+        _remember_thermostat_ids(found_ids, set(tids).difference(tid for tid, _ in thermostats))
     
     return rooms
 
 
-def get_lk_temperatures_with_targets(email: str, password: str) -> List[Dict[str, Any]]:
+def get_lk_temperatures_with_targets(
+    email: str,
+    password: str,
+    *,
+    plan_filter: Optional[Callable[[str], bool]] = None,
+) -> List[Dict[str, Any]]:
     """
     Fetch room temperatures AND target setpoints from LK Systems.
     
     Args:
         email: LK Systems account email
         password: LK Systems account password
+        plan_filter: Optional predicate on the plan name; rooms it rejects are
+            skipped before their name is decoded
     
     Returns:
-        List of room dictionaries with keys: id, name, temp, target_temp, plan
+        List of room dictionaries with keys: id, name, temp, target_temp, plan, plan_lower
     """
-    session = _lk_login(email, password)
+    _get_session(email, password)  # Login up front so auth failures raise to the caller
     rooms = []
-    network_config = CONFIG["network"]
     
+    # Get plan names
     try:
-        # Get plan names
+        main_response = _lk_get(email, password, "https://my.lk.nu/main.json")
+        main_data = json_loads(main_response.content)
+        plan_names = {
+            i: _hex_to_str(hex_name)
+            for i, hex_name in enumerate(main_data.get("sect_name", []))
+        }
+    except Exception:
+        plan_names = {}
+    
+    # Fetch each thermostat (only previously discovered ids once a full scan has run)
+    tids, full_scan = _thermostat_ids()
+    found_ids = []  # Real thermostats, including ones rejected by plan_filter
+    thermostats = _fetch_thermostats(email, password, tids)
+    for tid, thermostat_data in thermostats:
         try:
-            main_response = session.get(
-                "https://my.lk.nu/main.json",
-                verify=False,
-                timeout=network_config["timeout"],
+            if "get_room_deg" not in thermostat_data:
+                continue
+            
+            hex_name = thermostat_data.get("name", "")
+            if not hex_name or hex_name == "546865726D6F73746174":
+                continue
+            found_ids.append(tid)
+            
+            zones = thermostat_data.get("actuator_zone", [])
+            max_zone = max(map(int, zones), default=0)  # "0" = unused slot, never the max
+            plan = plan_names.get(
+                0 if max_zone <= 5 else 1,
+                f"Plan {1 if max_zone <= 5 else 2}",
             )
-            main_data = main_response.json()
-            plan_names = {
-                i: _hex_to_str(hex_name)
-                for i, hex_name in enumerate(main_data.get("sect_name", []))
-            }
-        except Exception:
-            plan_names = {}
-        
-        # Fetch each thermostat
-        for tid in range(64):
-            try:
-                thermostat_response = session.get(
-                    f"https://my.lk.nu/thermostat.json?tid={tid}",
-                    verify=False,
-                    timeout=network_config["timeout"],
-                )
-                thermostat_data = thermostat_response.json()
-                
-                if "get_room_deg" not in thermostat_data:
-                    continue
-                
-                hex_name = thermostat_data.get("name", "")
-                if not hex_name or hex_name == "546865726D6F73746174":
-                    continue
-                
-                name = _hex_to_str(hex_name)
-                zones = thermostat_data.get("actuator_zone", [])
-                max_zone = max([int(z) for z in zones if z != "0"], default=0)
-                plan = plan_names.get(
-                    0 if max_zone <= 5 else 1,
-                    f"Plan {1 if max_zone <= 5 else 2}",
-                )
-                
-                # Current temperature
-                temp = float(thermostat_data["get_room_deg"]) / 100.0
-                
-                # Target temperature (setpoint)
-                target_temp = float(thermostat_data.get("set_room_deg", 
-                                   thermostat_data.get("comfort_deg", "0"))) / 100.0
-                
-                rooms.append({
-                    "id": tid,
-                    "name": name,
-                    "temp": temp,
-                    "target_temp": target_temp,
-                    "plan": plan,
-                })
-            except Exception:
+            if plan_filter is not None and not plan_filter(plan):
                 continue
+            
+            name = _hex_to_str(hex_name)
+            
+            # Current temperature
+            temp = float(thermostat_data["get_room_deg"]) / 100.0
+            
+            # Target temperature (setpoint)
+            target_temp = float(thermostat_data.get("set_room_deg", 
+                               thermostat_data.get("comfort_deg", "0"))) / 100.0
+            
+            rooms.append({
+                "id": tid,
+                "name": name,
+                "temp": temp,
+                "target_temp": target_temp,
+                "plan": plan,
+                "plan_lower": plan.lower(),  # For case-insensitive plan matching
+            })
+        except Exception:
+            continue
     
-    finally:
-        session.close()
+    if full_scan:
+        _remember_thermostat_ids(found_ids, set(tids).difference(tid for tid, _ in thermostats))
     
     return rooms
 
@@ -254,17 +426,12 @@ def set_lk_temperature(room_id: int, target_temp: float, email: str, password: s
         True if successful, False otherwise
     """
     try:
-        session = _lk_login(email, password)
-        network_config = CONFIG["network"]
-        
         # Convert temperature to LK format (multiply by 100)
         temp_value = int(target_temp * 100)
         
-        # Send update request
+        # Send update request (cached session, re-login once if rejected)
         update_url = f"https://my.lk.nu/update.cgi?tid={room_id}&set_room_deg={temp_value}"
-        response = session.get(update_url, verify=False, timeout=network_config["timeout"])
-        
-        session.close()
+        response = _lk_get(email, password, update_url)
         
         return response.status_code == 200
         
@@ -294,31 +461,29 @@ def compute_weighted_avg(rooms: List[Dict[str, Any]]) -> Tuple[float, Dict[str,
         RuntimeError: If no rooms available after exclusions
     """
     excluded = CONFIG["rooms"]["excluded_names"]
-    included_rooms = [
-        (r["name"], r["temp"])
-        for r in rooms
-        if r["name"] not in excluded
-    ]
+    names = []
+    temps = []
+    for r in rooms:
+        if r["name"] not in excluded:
+            names.append(r["name"])
+            temps.append(r["temp"])
     
-    if not included_rooms:
+    if not temps:
         raise RuntimeError("No rooms available for averaging after exclusions.")
     
-    temps = [temp for _, temp in included_rooms]
     simple_mean = sum(temps) / len(temps)
     
     # Assign weights: rooms > mean + 0.5°C get weight 0.5
-    weighted_data = []
-    for name, temp in included_rooms:
-        weight = 0.5 if (temp > simple_mean + 0.5) else 1.0
-        weighted_data.append((name, temp, weight))
+    threshold = simple_mean + 0.5
+    weights = [0.5 if temp > threshold else 1.0 for temp in temps]
     
     # Compute weighted average
-    numerator = sum(temp * weight for _, temp, weight in weighted_data)
-    denominator = sum(weight for _, _, weight in weighted_data)
+    numerator = sum(map(mul, temps, weights))
+    denominator = sum(weights)
     weighted_avg = numerator / denominator if denominator > 0 else simple_mean
     
-    room_temp_map = {name: temp for name, temp, _ in weighted_data}
-    room_weights = {name: weight for name, _, weight in weighted_data}
+    room_temp_map = dict(zip(names, temps))
+    room_weights = dict(zip(names, weights))
     
     return weighted_avg, room_temp_map, room_weights, simple_mean
 
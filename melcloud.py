@@ -5,32 +5,122 @@
 MELCloud integration for heat pump control.
 """
 
+import hashlib
+import os
+import time
+from pathlib import Path
 import aiohttp
 import pymelcloud
 from typing import Dict, Optional
 
-from utils import log, fmt1
+from utils import log, fmt1, json_loads, json_dumps_pretty
 from config import CONFIG
 
 
+# How long a logged-in device is reused before logging in again (tokens last hours)
+DEVICE_TTL_S = 600.0
+
+# Login tokens persisted across runs (keyed by email hash, file readable by owner only)
+TOKEN_CACHE_FILE = Path.home() / ".cache" / "melcloud_token.json"
+
+
+def _token_key(email: str) -> str:
+    """Cache key for an account (the email itself is not stored)."""
+    return hashlib.sha256(email.strip().lower().encode("utf-8")).hexdigest()
+
+
+def _read_cached_token(email: str) -> Optional[str]:
+    """Return the persisted login token for email, if any."""
+    try:
+        with open(TOKEN_CACHE_FILE, "rb") as f:
+            entry = json_loads(f.read()).get(_token_key(email))
+    except (OSError, ValueError, AttributeError):
+        return None
+    return entry.get("token") if isinstance(entry, dict) else None
+
+
+def _write_cached_token(email: str, token: Optional[str]) -> None:
+    """Persist (or with token=None, drop) the login token for email."""
+    try:
+        with open(TOKEN_CACHE_FILE, "rb") as f:
+            cache = json_loads(f.read())
+        if not isinstance(cache, dict):
+            cache = {}
+    except (OSError, ValueError):
+        cache = {}
+    
+    if token is None:
+        cache.pop(_token_key(email), None)
+    else:
+        cache[_token_key(email)] = {"token": token, "saved": int(time.time())}
+    
+    # Atomic replace so a concurrent run never reads a half-written cache
+    tmp_path = TOKEN_CACHE_FILE.with_suffix(".json.tmp")
+    try:
+        TOKEN_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(json_dumps_pretty(cache))
+        os.replace(tmp_path, TOKEN_CACHE_FILE)
+    except OSError as e:
+        log(f"MEL: could not write token cache: {e}")
+
+
+def _is_auth_error(e: BaseException) -> bool:
+    """True if e is MELCloud rejecting the token (401/403)."""
+    return isinstance(e, aiohttp.ClientResponseError) and e.status in (401, 403)
+
+
+def create_session() -> aiohttp.ClientSession:
+    """
+    Create a keep-alive aiohttp session for MELCloud requests.
+    
+    Must be called from within a running event loop.
+    """
+    network_config = CONFIG["network"]
+    connector = aiohttp.TCPConnector(limit=20, limit_per_host=10, keepalive_timeout=300)
+    timeout = aiohttp.ClientTimeout(total=network_config["timeout"])
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
 class HeatPumpController:
-    """Controller for MELCloud heat pump operations."""
+    """
+    Controller for MELCloud heat pump operations.
     
-    def __init__(self):
+    The aiohttp session and the logged-in device are kept between calls (one login
+    per DEVICE_TTL_S); call close() (or use "async with") when done. A session
+    passed in by the caller is shared and left open by close().
+    """
+    
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        self.device = None
+        self.session: Optional[aiohttp.ClientSession] = session
+        self._owns_session = session is None
+        self._device_email: Optional[str] = None
+        self._device_time = 0.0
+    
+    async def __aenter__(self) -> "HeatPumpController":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+    
+    async def close(self) -> None:
+        """Close the session and forget the logged-in device."""
         self.device = None
-        self.session: Optional[aiohttp.ClientSession] = None
+        self._device_email = None
+        await self._close_session()
     
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get or create aiohttp session with timeout."""
         if self.session is None or self.session.closed:
-            network_config = CONFIG["network"]
-            timeout = aiohttp.ClientTimeout(total=network_config["timeout"])
-            self.session = aiohttp.ClientSession(timeout=timeout)
+            self.session = create_session()
+            self._owns_session = True
         return self.session
     
     async def _close_session(self) -> None:
-        """Close aiohttp session if open."""
-        if self.session and not self.session.closed:
+        """Close aiohttp session if open (only if this controller created it)."""
+        if self._owns_session and self.session and not self.session.closed:
             await self.session.close()
     
     async def _connect_and_get_device(self, email: str, password: str):
@@ -47,9 +137,39 @@ class HeatPumpController:
         Raises:
             Exception: If no ATW device found
         """
+        # Reuse the logged-in device while fresh: only refresh its state
+        if (
+            self.device is not None
+            and self._device_email == email
+            and self.session is not None and not self.session.closed
+            and time.monotonic() - self._device_time < DEVICE_TTL_S
+        ):
+            try:
+                await self.device.update()
+                return self.device
+            except Exception as e:
+                # Stale token or dropped connection: log in again below
+                log(f"MEL: cached device update failed ({e}), logging in again")
+                self.device = None
+        
         session = await self._get_session()
-        token = await pymelcloud.login(email, password, session=session)
-        devices = await pymelcloud.get_devices(token, session=session)
+        
+        # Try the persisted token first; log in (and persist) only if missing or rejected
+        devices = None
+        token = _read_cached_token(email)
+        if token:
+            try:
+                devices = await pymelcloud.get_devices(token, session=session)
+            except aiohttp.ClientResponseError as e:
+                if not _is_auth_error(e):
+                    raise
+                log("MEL: cached token rejected, logging in again")
+                _write_cached_token(email, None)
+        
+        if devices is None:
+            token = await pymelcloud.login(email, password, session=session)
+            _write_cached_token(email, token)
+            devices = await pymelcloud.get_devices(token, session=session)
         
         # Find Air-to-Water devices
         atw_list = []
@@ -78,8 +198,89 @@ class HeatPumpController:
         device = atw_list[0]
         await device.update()
         self.device = device
+        self._device_email = email
+        self._device_time = time.monotonic()
         return device
     
+    @staticmethod
+    def _read_outdoor_temperature(device) -> Optional[float]:
+        """Extract outdoor temperature from an updated device (several possible locations)."""
+        # Try multiple locations for outdoor temp
+        val = getattr(device, "outside_temperature", None)
+        if val is not None:
+            log(f"MEL: outdoor via device.outside_temperature = {fmt1(val)}°C")
+            return float(val)
+        
+        status = getattr(device, "status", None)
+        if isinstance(status, dict) and "OutdoorTemperature" in status:
+            val = status.get("OutdoorTemperature")
+            log(f"MEL: outdoor via status['OutdoorTemperature'] = {fmt1(val)}°C")
+            return float(val)
+        
+        device_conf = getattr(device, "_device_conf", None)
+        if isinstance(device_conf, dict):
+            dev = device_conf.get("Device") or {}
+            if isinstance(dev, dict) and "OutdoorTemperature" in dev:
+                val = dev.get("OutdoorTemperature")
+                log(f"MEL: outdoor via conf['Device']['OutdoorTemperature'] = {fmt1(val)}°C")
+                return float(val)
+        
+        log("MEL: outdoor temperature not found.")
+        return None
+    
+    @staticmethod
+    def _read_key_temperatures(device) -> Dict[str, Optional[float]]:
+        """Extract flow, return and tank temperatures from an updated device."""
+        flow_temp = return_temp = tank_current = tank_target = None
+        
+        zones = getattr(device, "zones", []) or []
+        if zones:
+            zone0 = zones[0]
+            flow_temp = getattr(zone0, "flow_temperature", None)
+            return_temp = getattr(zone0, "return_temperature", None)
+        
+        tank_current = getattr(device, "tank_temperature", None)
+        tank_target = getattr(device, "target_tank_temperature", None)
+        
+        log(
+            f"MEL: zone0 flow={fmt1(flow_temp)}°C, return={fmt1(return_temp)}°C; "
+            f"tank_current={fmt1(tank_current)}°C, tank_target={fmt1(tank_target)}°C"
+        )
+        
+        return {
+            "flow": float(flow_temp) if flow_temp is not None else None,
+            "return": float(return_temp) if return_temp is not None else None,
+            "tank_current": float(tank_current) if tank_current is not None else None,
+            "tank_target": float(tank_target) if tank_target is not None else None,
+        }
+    
+    async def get_all_temperatures(self, email: str, password: str) -> Dict[str, Optional[float]]:
+        """
+        Get outdoor and key temperatures from one device update.
+        
+        Args:
+            email: MELCloud account email
+            password: MELCloud account password
+        
+        Returns:
+            Dict with keys: outdoor, flow, return, tank_current, tank_target
+            (a group that cannot be read is None, the other is still returned)
+        """
+        device = await self._connect_and_get_device(email, password)
+        
+        try:
+            temps = {"outdoor": self._read_outdoor_temperature(device)}
+        except Exception as e:
+            log(f"[ERR] MEL outdoor read failed: {e}")
+            temps = {"outdoor": None}
+        
+        try:
+            temps.update(self._read_key_temperatures(device))
+        except Exception as e:
+            log(f"[ERR] MEL key temps read failed: {e}")
+            temps.update({"flow": None, "return": None, "tank_current": None, "tank_target": None})
+        return temps
+    
     async def get_outdoor_temperature(self, email: str, password: str) -> Optional[float]:
         """
         Get outdoor temperature from heat pump.
@@ -91,34 +292,8 @@ class HeatPumpController:
         Returns:
             Outdoor temperature (°C) or None if unavailable
         """
-        try:
-            device = await self._connect_and_get_device(email, password)
-            
-            # Try multiple locations for outdoor temp
-            val = getattr(device, "outside_temperature", None)
-            if val is not None:
-                log(f"MEL: outdoor via device.outside_temperature = {fmt1(val)}°C")
-                return float(val)
-            
-            status = getattr(device, "status", None)
-            if isinstance(status, dict) and "OutdoorTemperature" in status:
-                val = status.get("OutdoorTemperature")
-                log(f"MEL: outdoor via status['OutdoorTemperature'] = {fmt1(val)}°C")
-                return float(val)
-            
-            device_conf = getattr(device, "_device_conf", None)
-            if isinstance(device_conf, dict):
-                dev = device_conf.get("Device") or {}
-                if isinstance(dev, dict) and "OutdoorTemperature" in dev:
-                    val = dev.get("OutdoorTemperature")
-                    log(f"MEL: outdoor via conf['Device']['OutdoorTemperature'] = {fmt1(val)}°C")
-                    return float(val)
-            
-            log("MEL: outdoor temperature not found.")
-            return None
-            
-        finally:
-            await self._close_session()
+        device = await self._connect_and_get_device(email, password)
+        return self._read_outdoor_temperature(device)
     
     async def get_key_temperatures(self, email: str, password: str) -> Dict[str, Optional[float]]:
         """
@@ -131,34 +306,8 @@ class HeatPumpController:
         Returns:
             Dict with keys: flow, return, tank_current, tank_target
         """
-        try:
-            device = await self._connect_and_get_device(email, password)
-            
-            flow_temp = return_temp = tank_current = tank_target = None
-            
-            zones = getattr(device, "zones", []) or []
-            if zones:
-                zone0 = zones[0]
-                flow_temp = getattr(zone0, "flow_temperature", None)
-                return_temp = getattr(zone0, "return_temperature", None)
-            
-            tank_current = getattr(device, "tank_temperature", None)
-            tank_target = getattr(device, "target_tank_temperature", None)
-            
-            log(
-                f"MEL: zone0 flow={fmt1(flow_temp)}°C, return={fmt1(return_temp)}°C; "
-                f"tank_current={fmt1(tank_current)}°C, tank_target={fmt1(tank_target)}°C"
-            )
-            
-            return {
-                "flow": float(flow_temp) if flow_temp is not None else None,
-                "return": float(return_temp) if return_temp is not None else None,
-                "tank_current": float(tank_current) if tank_current is not None else None,
-                "tank_target": float(tank_target) if tank_target is not None else None,
-            }
-            
-        finally:
-            await self._close_session()
+        device = await self._connect_and_get_device(email, password)
+        return self._read_key_temperatures(device)
     
     async def set_flow_temperature_all_zones_int(
         self,
@@ -169,6 +318,9 @@ class HeatPumpController:
         """
         Set flow temperature for all zones.
         
+        If MELCloud rejects the (cached) token mid-write, the token is dropped and
+        the write is retried once after a fresh login.
+        
         Args:
             email: MELCloud account email
             password: MELCloud account password
@@ -177,29 +329,34 @@ class HeatPumpController:
         Returns:
             True if successful, False otherwise
         """
-        try:
-            device = await self._connect_and_get_device(email, password)
-            target = int(round(float(temperature_c)))
-            
-            zones = getattr(device, "zones", []) or []
-            if not zones and hasattr(device, "set"):
-                await device.set({"target_flow_temperature": target})
-                log(f"MEL: device-level flow set to {target}°C")
-                return True
-            
-            ok = 0
-            for zone in zones:
-                await zone.set_target_heat_flow_temperature(target)
-                ok += 1
-            
-            log(f"MEL: set flow to {target}°C on {ok} zone(s).")
-            return ok > 0
-            
-        except Exception as e:
-            log(f"[ERR] Failed to set flow temperature: {e}")
-            return False
-        finally:
-            await self._close_session()
+        target = int(round(float(temperature_c)))
+        for attempt in range(2):
+            try:
+                device = await self._connect_and_get_device(email, password)
+                
+                zones = getattr(device, "zones", []) or []
+                if not zones and hasattr(device, "set"):
+                    await device.set({"target_flow_temperature": target})
+                    log(f"MEL: device-level flow set to {target}°C")
+                    return True
+                
+                ok = 0
+                for zone in zones:
+                    await zone.set_target_heat_flow_temperature(target)
+                    ok += 1
+                
+                log(f"MEL: set flow to {target}°C on {ok} zone(s).")
+                return ok > 0
+                
+            except Exception as e:
+                if attempt == 0 and _is_auth_error(e):
+                    log("MEL: token rejected during flow set, logging in again")
+                    _write_cached_token(email, None)
+                    self.device = None
+                    continue
+                log(f"[ERR] Failed to set flow temperature: {e}")
+                return False
+        return False
     
     async def set_tank_temperature(self, email: str, password: str, temperature: float) -> bool:
         """
@@ -221,8 +378,6 @@ class HeatPumpController:
         except Exception as e:
             log(f"[ERR] Failed to set tank temperature: {e}")
             return False
-        finally:
-            await self._close_session()
 
 
 
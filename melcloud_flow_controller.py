@@ -28,19 +28,26 @@ import datetime as dt
 import asyncio
 from typing import Optional
 
-# Windows event loop policy
+# Windows event loop policy; elsewhere use uvloop's C event loop if installed
 if os.name == "nt":
     try:
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     except Exception:
         pass
+else:
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
 
 from utils import log, ema_update, fmt1, fmt2
-from config import CONFIG, VERSION
+import config
 from lk_systems import get_lk_temperatures, compute_weighted_avg
-from melcloud import HeatPumpController
+from melcloud import HeatPumpController, create_session
 from shelly_backup import get_shelly_temperature
 from control_logic import (
+    TempHistory,
     hourly_rhythm_decision,
     calculate_trajectory,
     update_temp_history,
@@ -50,18 +57,20 @@ from state_manager import CSVStateManager
 from dhw_valve_guard import update_valve_guard
 
 
-def is_holiday_mode_active(now: dt.datetime) -> bool:
+def is_holiday_mode_active(now: dt.datetime, holiday_config: Optional[config.HolidayMode] = None) -> bool:
     """
     Check if holiday mode should be active based on current datetime.
     
     Args:
         now: Current datetime
+        holiday_config: Holiday mode settings (defaults to config.CFG.holiday_mode)
     
     Returns:
         True if holiday mode should be active, False otherwise
     """
-    holiday_config = CONFIG.get("holiday_mode", {})
-    mode = holiday_config.get("mode", 0)
+    if holiday_config is None:
+        holiday_config = config.CFG.holiday_mode
+    mode = holiday_config.mode
     
     # Mode 0: Force disable
     if mode == 0:
@@ -73,19 +82,19 @@ def is_holiday_mode_active(now: dt.datetime) -> bool:
     
     # Mode 1: Enable on date/time
     if mode == 1:
-        start_date_str = holiday_config.get("start_date", "")
-        start_time_str = holiday_config.get("start_time", "00:00")
-        end_date_str = holiday_config.get("end_date", "")
-        end_time_str = holiday_config.get("end_time", "23:59")
+        start_date_str = holiday_config.start_date
+        start_time_str = holiday_config.start_time
+        end_date_str = holiday_config.end_date
+        end_time_str = holiday_config.end_time
         
         try:
             # Parse start datetime
-            start_date = dt.datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            start_date = dt.date.fromisoformat(start_date_str)  # YYYY-MM-DD (C parser, no _strptime import)
             start_hour, start_min = map(int, start_time_str.split(":"))
             start_dt = dt.datetime.combine(start_date, dt.time(start_hour, start_min))
             
             # Parse end datetime
-            end_date = dt.datetime.strptime(end_date_str, "%Y-%m-%d").date()
+            end_date = dt.date.fromisoformat(end_date_str)
             end_hour, end_min = map(int, end_time_str.split(":"))
             end_dt = dt.datetime.combine(end_date, dt.time(end_hour, end_min))
             
@@ -134,18 +143,20 @@ async def run_once():
     log(f"Running script: {os.path.abspath(__file__)}")
     now = dt.datetime.now()
     
-    creds = CONFIG["credentials"]
-    flow_limits = CONFIG["flow_limits"]
-    control_config = CONFIG["control"]
+    # Typed config tree built once at import (read via the module so invalidate_config_cache() applies)
+    cfg = config.CFG
+    creds = cfg.credentials
+    flow_limits = cfg.flow_limits
+    control_config = cfg.control
     
     # Check for manual mode and holiday mode (manual mode affects both normal and holiday mode)
-    manual_mode_enabled = CONFIG.get("manual_mode", {}).get("enable", 0) == 1
-    holiday_mode_enabled = is_holiday_mode_active(now)  # Use date/time-based check
+    manual_mode_enabled = cfg.manual_mode.enable == 1
+    holiday_mode_enabled = is_holiday_mode_active(now, cfg.holiday_mode)  # Use date/time-based check
     
-    # Select appropriate control config based on mode
+    # Select appropriate control config based on mode (holiday sections already fall back to normal ones)
     if holiday_mode_enabled:
-        control_config = CONFIG.get("holiday_control", control_config)
-        flow_limits = CONFIG.get("holiday_flow_limits", flow_limits)
+        control_config = cfg.holiday_control
+        flow_limits = cfg.holiday_flow_limits
         log("[HOLIDAY MODE] Using holiday mode settings (lower target temp, conservative weather curve)")
     else:
         log("[NORMAL MODE] Using normal mode settings")
@@ -153,265 +164,282 @@ async def run_once():
     if manual_mode_enabled:
         log("[MANUAL MODE] Flow temperature calculation only - no MELCloud application")
     
-    # ========== 1) Fetch LK Room Temperatures ==========
-    try:
-        rooms = get_lk_temperatures(creds["lk_email"], creds["lk_password"])
-        log(f"LK: fetched {len(rooms)} thermostats.")
-    except Exception as e:
-        log(f"[ERR] LK fetch failed: {e}")
-        rooms = []
-    
-    # ========== 2) Compute Weighted Average ==========
-    avg_temp = None
-    room_map = {}
-    room_weights = {}
-    simple_mean = None
-    shelly_temp = None
-    shelly_humidity = None
-    
-    if rooms:
-        try:
-            avg_temp, room_map, room_weights, simple_mean = compute_weighted_avg(rooms)
-            temps_str = ", ".join([
-                f"{name}={room_map[name]}°C(w={room_weights.get(name, 1.0):.1f})"
-                for name in sorted(room_map.keys())
-            ])
-            log(f"Rooms: {temps_str}")
-            log(f"Avg (simple)={simple_mean:.2f}°C, Avg (weighted)={avg_temp:.2f}°C")
-        except Exception as e:
-            log(f"[ERR] Avg computation failed: {e}")
-    
-    # ========== 2.5) Fetch Shelly Backup (if LK Systems failed) ==========
-    # V4.8: Always fetch Shelly, but use as backup if LK Systems unavailable
-    shelly_temp, shelly_humidity = get_shelly_temperature()
-    
-    if avg_temp is None and shelly_temp is not None:
-        # Use Shelly as backup
-        avg_temp = shelly_temp
-        log(f"[BACKUP] Using Shelly temperature {avg_temp:.2f}°C as avg_temp (LK Systems unavailable)")
-        # room_map stays empty (will be handled in CSV write)
+    # Integer flow bounds for the selected mode, cast once
+    flow_lo, flow_hi = int(flow_limits.off), int(flow_limits.max)
     
-    # ========== 3) Fetch MELCloud Temperatures ==========
-    hp_out = HeatPumpController()
-    try:
-        outside_temp = await hp_out.get_outdoor_temperature(creds["mel_email"], creds["mel_password"])
-        log(f"MEL: outdoor via device.outside_temperature = {outside_temp}°C")
-    except Exception as e:
-        log(f"[ERR] MEL outdoor fetch failed: {e}")
-        outside_temp = None
-    
-    hp_meas = HeatPumpController()
-    try:
-        keytemps = await hp_meas.get_key_temperatures(creds["mel_email"], creds["mel_password"])
-        flow_meas = keytemps.get("flow")
-        return_meas = keytemps.get("return")
-        tank_cur = keytemps.get("tank_current")
-        tank_tgt = keytemps.get("tank_target")
-        log(f"MEL: zone0 flow={fmt1(flow_meas)}°C, return={fmt1(return_meas)}°C; tank_current={fmt1(tank_cur)}°C, tank_target={fmt1(tank_tgt)}°C")
-    except Exception as e:
-        log(f"[ERR] MEL key temps fetch failed: {e}")
-        flow_meas = return_meas = tank_cur = tank_tgt = None
-    
-    # ========== 4) Read Previous State ==========
-    state_mgr = CSVStateManager()
-    state_mgr.migrate_header_if_needed(list(room_map.keys()))
-    
-    prev_ema, prev_last_cmd, prev_hourly_cmd, temp_history, prev_tank_temp, prev_dhw_start_time = (
-        state_mgr.read_last_state()
+    # V4.5: Control decision only at top of hour (XX:00-XX:09); decided up front so
+    # monitoring runs can skip the MELCloud reads when configured to
+    at_top_of_hour = is_top_of_hour(now, cfg.application.apply_window_minutes)
+    skip_melcloud = (
+        not at_top_of_hour
+        and cfg.application.monitor_skip_melcloud
+        and not cfg.dhw_guard.enable
     )
     
-    # ========== 4.5) Fallback to Last Known Good Temperature if Both Failed ==========
-    # V4.8: If avg_temp is still None (both LK Systems and Shelly failed), use last valid from CSV
-    if avg_temp is None:
-        last_valid_avg_temp = None
-        if temp_history:
-            # Get most recent valid temperature from history
-            last_valid_avg_temp = temp_history[-1][1] if temp_history else None
-        
-        # Also try reading from last CSV row directly
-        if last_valid_avg_temp is None:
-            rows = state_mgr.read_rows()
-            if rows and len(rows) > 1:
-                header = rows[0]
-                idx = {col: i for i, col in enumerate(header)}
-                if "avg_temp" in idx:
-                    for row in reversed(rows[1:]):  # Search backwards from most recent
-                        if idx["avg_temp"] < len(row):
-                            val = row[idx["avg_temp"]].strip()
-                            if val and val != "":
-                                try:
-                                    last_valid_avg_temp = float(val)
-                                    break
-                                except ValueError:
-                                    continue
+    # ========== 1) Fetch LK Room Temperatures ==========
+    # LK (blocking requests) runs in a worker thread while the MELCloud read (step 3)
+    # proceeds on the event loop; both are gathered at once, failures come back as
+    # exception objects handled per step
+    loop = asyncio.get_running_loop()
+    
+    # One keep-alive session for MELCloud and Shelly; one controller (one MELCloud login)
+    # for all reads and the flow update below
+    mel_session = create_session()
+    hp = HeatPumpController(session=mel_session)
+    
+    # Shelly starts speculatively alongside; step 2.5 cancels it if LK delivers an average
+    shelly_task = asyncio.ensure_future(get_shelly_temperature(mel_session))
+    try:
+        rooms, mel_temps = await asyncio.gather(
+            loop.run_in_executor(None, get_lk_temperatures, creds.lk_email, creds.lk_password),
+            asyncio.sleep(0, result=None) if skip_melcloud else hp.get_all_temperatures(creds.mel_email, creds.mel_password),
+            return_exceptions=True,
+        )
         
-        if last_valid_avg_temp is not None:
-            avg_temp = last_valid_avg_temp
-            log(f"[FALLBACK] Using last known avg_temp={avg_temp:.2f}°C from CSV history")
+        if isinstance(rooms, Exception):
+            log(f"[ERR] LK fetch failed: {rooms}")
+            rooms = []
         else:
-            log("[FALLBACK] No temperature data available - cannot make control decision")
-    
-    # ========== 5) Update EMA of Outdoor Temperature ==========
-    if outside_temp is not None:
-        ema_tout = ema_update(
-            prev_ema,
-            float(outside_temp),
-            CONFIG["ema"]["alpha_outdoor"]
-        ) if prev_ema is not None else float(outside_temp)
-    else:
-        ema_tout = prev_ema if prev_ema is not None else 8.0
-        log("MEL: using previous EMA or default 8.0°C due to missing outdoor.")
-    
-    log(f"Outdoor EMA={ema_tout:.1f}°C (prev={fmt1(prev_ema)})")
-    
-    # ========== 6) Update Temperature History ==========
-    if avg_temp is not None:
-        temp_history = update_temp_history(
-            temp_history=temp_history,
-            timestamp=now.isoformat(),
-            temperature=avg_temp,
-            max_readings=CONFIG["prediction"]["lookback_readings"],
-        )
-    
-    # ========== 7) Calculate Trajectory ==========
-    traj_slope, traj_status = calculate_trajectory(temp_history)
-    
-    if traj_status == "ok":
-        log(f"Trajectory: slope={fmt2(traj_slope)}°C/h (2h history, {len(temp_history)} readings)")
-    else:
-        log(f"Trajectory: {traj_status}")
-    
-    # ========== 8) Check DHW Guard ==========
-    dhw_active, dhw_start_time = check_dhw_guard(tank_cur, prev_tank_temp, prev_dhw_start_time, now)
-    if CONFIG["dhw_guard"]["enable"]:
-        tank_cur_str = fmt1(tank_cur) if tank_cur is not None else "N/A"
-        tank_rise = tank_cur - prev_tank_temp if (tank_cur is not None and prev_tank_temp is not None) else 0.0
+            log(f"LK: fetched {len(rooms)} thermostats.")
         
-        # Calculate elapsed time if DHW is active
-        elapsed_str = ""
-        if dhw_active and dhw_start_time:
+        # ========== 2) Compute Weighted Average ==========
+        avg_temp = None
+        room_map = {}
+        room_weights = {}
+        simple_mean = None
+        shelly_temp = None
+        shelly_humidity = None
+        
+        if rooms:
             try:
-                start_dt = dt.datetime.fromisoformat(dhw_start_time)
-                elapsed_minutes = int((now - start_dt).total_seconds() / 60)
-                elapsed_str = f", elapsed={elapsed_minutes}min"
-            except Exception:
-                pass
+                avg_temp, room_map, room_weights, simple_mean = compute_weighted_avg(rooms)
+                temps_str = ", ".join(
+                    f"{name}={temp}°C(w={room_weights.get(name, 1.0):.1f})"
+                    for name, temp in sorted(room_map.items())
+                )
+                log(f"Rooms: {temps_str}")
+                log(f"Avg (simple)={simple_mean:.2f}°C, Avg (weighted)={avg_temp:.2f}°C")
+            except Exception as e:
+                log(f"[ERR] Avg computation failed: {e}")
         
-        log(f"DHW guard: {'ACTIVE' if dhw_active else 'inactive'} (tank_cur={tank_cur_str}°C, rise={fmt1(tank_rise)}°C{elapsed_str})")
+        # ========== 2.5) Fetch Shelly Backup (if LK Systems failed) ==========
+        # V4.8: Use Shelly as backup if LK Systems unavailable; only wait for it when needed
+        shelly_fetched = avg_temp is None or cfg.shelly.always_log
+        if not shelly_fetched:
+            shelly_task.cancel()
+        else:
+            shelly_temp, shelly_humidity = await shelly_task
         
-        # Update valve guard (close/restore Plan 2 valves)
-        update_valve_guard(dhw_active)
-    
-    # ========== 9) Check if Top of Hour (Control Decision vs. Monitoring) ==========
-    # V4.5: Only run control decision at top of hour (XX:00-XX:09)
-    # Between hours (XX:10-XX:59): Just monitor, use last applied flow
-    app_config = CONFIG["application"]
-    at_top_of_hour = is_top_of_hour(now, app_config["apply_window_minutes"])
-    
-    if at_top_of_hour:
-        # ========== TOP OF HOUR: Run Control Decision ==========
-        log(f"[DECISION] Top of hour - running control decision")
+        if avg_temp is None and shelly_temp is not None:
+            # Use Shelly as backup
+            avg_temp = shelly_temp
+            log(f"[BACKUP] Using Shelly temperature {avg_temp:.2f}°C as avg_temp (LK Systems unavailable)")
+            # room_map stays empty (will be handled in CSV write)
+        
+        # ========== 3) Fetch MELCloud Temperatures ==========
+        try:
+            # Outdoor + flow/return/tank from a single device update (gathered in step 1)
+            if skip_melcloud:
+                log("[MONITOR] MELCloud reads skipped between hours (monitor_skip_melcloud)")
+                mel_temps = {}
+            elif isinstance(mel_temps, Exception):
+                raise mel_temps
+            outside_temp = mel_temps.get("outdoor")
+            flow_meas = mel_temps.get("flow")
+            return_meas = mel_temps.get("return")
+            tank_cur = mel_temps.get("tank_current")
+            tank_tgt = mel_temps.get("tank_target")
+            log(f"MEL: outdoor via device.outside_temperature = {outside_temp}°C")
+            log(f"MEL: zone0 flow={fmt1(flow_meas)}°C, return={fmt1(return_meas)}°C; tank_current={fmt1(tank_cur)}°C, tank_target={fmt1(tank_tgt)}°C")
+        except Exception as e:
+            log(f"[ERR] MEL temperature fetch failed: {e}")
+            outside_temp = flow_meas = return_meas = tank_cur = tank_tgt = None
+        
+        # ========== 4) Read Previous State ==========
+        state_mgr = CSVStateManager()
+        state_mgr.migrate_header_if_needed(list(room_map.keys()))
         
+        prev_ema, prev_last_cmd, prev_hourly_cmd, temp_history, prev_tank_temp, prev_dhw_start_time = (
+            state_mgr.read_last_state()
+        )
+        temp_history = TempHistory.from_pairs(temp_history, maxlen=cfg.prediction.lookback_readings)
+        
+        # ========== 4.5) Fallback to Last Known Good Temperature if Both Failed ==========
+        # V4.8: If avg_temp is still None (both LK Systems and Shelly failed), use last valid from CSV
         if avg_temp is None:
-            # V4.8: This should rarely happen now (we use Shelly backup and CSV fallback)
-            # But if it does, use conservative hold strategy
-            log("[FALLBACK] No average temperature available - holding current flow")
+            last_valid_avg_temp = None
+            if temp_history:
+                # Get most recent valid temperature from history
+                last_valid_avg_temp = temp_history.vals[-1] if temp_history else None
             
-            # Use last applied flow (conservative hold)
-            flow_cmd = prev_last_cmd if prev_last_cmd is not None else 28.0
-            flow_cmd = int(round(float(flow_cmd)))
+            # Also try reading from last CSV row directly (backwards tail scan)
+            if last_valid_avg_temp is None:
+                last_valid_avg_temp = state_mgr.find_last_avg_temp()
             
-            predicted_temp = 0.0
-            predicted_error = 0.0
-            reference_flow = flow_cmd
-            adjustment = 0.0
-            decision_zone = "FALLBACK"
-            decision_comment = "No average temperature available - holding flow"
-            # Override comment if manual mode is enabled
-            if manual_mode_enabled:
-                decision_comment = "Manual mode"
+            if last_valid_avg_temp is not None:
+                avg_temp = last_valid_avg_temp
+                log(f"[FALLBACK] Using last known avg_temp={avg_temp:.2f}°C from CSV history")
+            else:
+                log("[FALLBACK] No temperature data available - cannot make control decision")
+        
+        # ========== 5) Update EMA of Outdoor Temperature ==========
+        if outside_temp is not None:
+            # ema_update seeds with the raw value when there is no previous EMA
+            ema_tout = ema_update(prev_ema, float(outside_temp), cfg.ema.alpha_outdoor)
         else:
-            # Use last HOURLY flow (from 1h ago) for single-step logic
-            last_flow_for_step = prev_hourly_cmd if prev_hourly_cmd is not None else 28.0
-            
-            flow_cmd, predicted_temp, predicted_error, reference_flow, adjustment, decision_zone, decision_comment = hourly_rhythm_decision(
-                outdoor_ema=ema_tout,
-                outdoor_temp=outside_temp if outside_temp is not None else ema_tout,  # V5.2: Use raw temp for weather curve
-                avg_temp=avg_temp,
-                setpoint=control_config["target_room_temp"],
-                trajectory_slope=traj_slope,
-                traj_status=traj_status,
-                last_flow=last_flow_for_step,
-                dhw_active=dhw_active,
-                use_holiday_mode=holiday_mode_enabled,
-            )
-            
-            # Override comment if manual mode is enabled
-            if manual_mode_enabled:
-                decision_comment = "Manual mode"
+            ema_tout = prev_ema if prev_ema is not None else 8.0
+            log("MEL: using previous EMA or default 8.0°C due to missing outdoor.")
         
-        # Round to integer for MELCloud
-        flow_cmd = int(round(float(flow_cmd)))
+        log(f"Outdoor EMA={ema_tout:.1f}°C (prev={fmt1(prev_ema)})")
         
-        # Ensure within limits
-        flow_cmd = max(int(flow_limits["off"]), min(int(flow_limits["max"]), flow_cmd))
+        # ========== 6) Update Temperature History ==========
+        if avg_temp is not None:
+            temp_history = update_temp_history(
+                temp_history=temp_history,
+                timestamp=now.isoformat(),
+                temperature=avg_temp,
+                max_readings=cfg.prediction.lookback_readings,
+            )
         
-        log(f"Control: flow={flow_cmd}°C, zone={decision_zone}, pred_err={fmt2(predicted_error)}°C")
-        log(f"  {decision_comment}")
+        # ========== 7) Calculate Trajectory ==========
+        traj_slope, traj_status = calculate_trajectory(temp_history, cfg.prediction.lookback_readings)
         
-        # Apply flow command to MELCloud (skip if manual mode is enabled)
-        if manual_mode_enabled:
-            log(f"[MANUAL MODE] Skipping MELCloud application - calculated flow={flow_cmd}°C (not applied)")
+        if traj_status == "ok":
+            log(f"Trajectory: slope={fmt2(traj_slope)}°C/h (2h history, {len(temp_history)} readings)")
         else:
-            log(f"[APPLY] Applying flow to MELCloud")
-            hp_set = HeatPumpController()
-            applied_ok = await hp_set.set_flow_temperature_all_zones_int(
-                creds["mel_email"],
-                creds["mel_password"],
-                flow_cmd
-            )
+            log(f"Trajectory: {traj_status}")
+        
+        # ========== 8) Check DHW Guard ==========
+        dhw_active, dhw_start_time = check_dhw_guard(tank_cur, prev_tank_temp, prev_dhw_start_time, now)
+        if cfg.dhw_guard.enable:
+            tank_cur_str = fmt1(tank_cur) or "N/A"
+            tank_rise = tank_cur - prev_tank_temp if (tank_cur is not None and prev_tank_temp is not None) else 0.0
             
-            if applied_ok:
-                log(f"✓ Applied flow={flow_cmd}°C to MELCloud successfully.")
-            else:
-                log("[WARN] Could not apply flow to MELCloud.")
-    
-    else:
-        # ========== MONITORING: Skip Control Decision ==========
-        # Use last applied flow (from previous row, which was at XX:00)
-        flow_cmd = prev_last_cmd if prev_last_cmd is not None else 28.0
-        flow_cmd = int(round(float(flow_cmd)))
+            # Calculate elapsed time if DHW is active
+            elapsed_str = ""
+            if dhw_active and dhw_start_time is not None:
+                elapsed_minutes = (int(now.timestamp()) - dhw_start_time) // 60
+                elapsed_str = f", elapsed={elapsed_minutes}min"
+            
+            log(f"DHW guard: {'ACTIVE' if dhw_active else 'inactive'} (tank_cur={tank_cur_str}°C, rise={fmt1(tank_rise)}°C{elapsed_str})")
+            
+            # Update valve guard (close/restore Plan 2 valves)
+            update_valve_guard(dhw_active)
         
-        # Calculate prediction for CSV visibility (but don't make decisions)
-        if avg_temp is not None and traj_slope is not None:
-            # Use same 2-hour lookahead as decision logic
-            lookahead_hours = 2.0
-            predicted_temp = avg_temp + (traj_slope * lookahead_hours)
-            predicted_error = control_config["target_room_temp"] - predicted_temp
-        else:
-            # V4.8: Use last known values if available
-            if avg_temp is not None:
-                predicted_temp = avg_temp
-                predicted_error = control_config["target_room_temp"] - avg_temp
-            else:
-                # No data at all - use zeros but log warning
+        # ========== 9) Check if Top of Hour (Control Decision vs. Monitoring) ==========
+        # V4.5: Only run control decision at top of hour (XX:00-XX:09)
+        # Between hours (XX:10-XX:59): Just monitor, use last applied flow
+        # (at_top_of_hour was determined before the fetches)
+        
+        if at_top_of_hour:
+            # ========== TOP OF HOUR: Run Control Decision ==========
+            log(f"[DECISION] Top of hour - running control decision")
+            
+            if avg_temp is None:
+                # V4.8: This should rarely happen now (we use Shelly backup and CSV fallback)
+                # But if it does, use conservative hold strategy
+                log("[FALLBACK] No average temperature available - holding current flow")
+                
+                # Use last applied flow (conservative hold)
+                flow_cmd = prev_last_cmd if prev_last_cmd is not None else 28.0
+                flow_cmd = int(round(float(flow_cmd)))
+                
                 predicted_temp = 0.0
                 predicted_error = 0.0
-                log("[WARN] No avg_temp available for prediction")
-        
-        reference_flow = flow_cmd  # Use current flow as reference
-        adjustment = 0.0
-        decision_zone = "MONITOR"
-        
-        # Build monitoring comment
-        next_hour = now.replace(minute=0, second=0, microsecond=0) + dt.timedelta(hours=1)
-        decision_comment = f"Monitoring (last applied: {flow_cmd}°C at {now.replace(minute=0, second=0).strftime('%H:%M')})"
-        
-        log(f"[MONITOR] Between hours - monitoring only")
-        log(f"  Last applied: {flow_cmd}°C, next decision at {next_hour.strftime('%H:%M')}")
-        log(f"  Current: avg_temp={fmt2(avg_temp)}°C, slope={fmt2(traj_slope)}°C/h, pred_err={fmt2(predicted_error)}°C")
+                reference_flow = flow_cmd
+                adjustment = 0.0
+                decision_zone = "FALLBACK"
+                decision_comment = "No average temperature available - holding flow"
+                # Override comment if manual mode is enabled
+                if manual_mode_enabled:
+                    decision_comment = "Manual mode"
+            else:
+                # Use last HOURLY flow (from 1h ago) for single-step logic
+                last_flow_for_step = prev_hourly_cmd if prev_hourly_cmd is not None else 28.0
+                
+                flow_cmd, predicted_temp, predicted_error, reference_flow, adjustment, decision_zone, decision_comment = hourly_rhythm_decision(
+                    outdoor_temp=outside_temp if outside_temp is not None else ema_tout,  # V5.2: Use raw temp for weather curve
+                    avg_temp=avg_temp,
+                    setpoint=control_config.target_room_temp,
+                    trajectory_slope=traj_slope,
+                    last_flow=last_flow_for_step,
+                    dhw_active=dhw_active,
+                    use_holiday_mode=holiday_mode_enabled,
+                    outdoor_ema=ema_tout,
+                )
+                
+                # Override comment if manual mode is enabled
+                if manual_mode_enabled:
+                    decision_comment = "Manual mode"
+            
+            # Round to integer for MELCloud
+            flow_cmd = int(round(float(flow_cmd)))
+            
+            # Ensure within limits
+            flow_cmd = flow_lo if flow_cmd < flow_lo else (flow_hi if flow_cmd > flow_hi else flow_cmd)
+            
+            log(f"Control: flow={flow_cmd}°C, zone={decision_zone}, pred_err={fmt2(predicted_error)}°C")
+            log(f"  {decision_comment}")
+            
+            # Apply flow command to MELCloud (skip if manual mode is enabled)
+            if manual_mode_enabled:
+                log(f"[MANUAL MODE] Skipping MELCloud application - calculated flow={flow_cmd}°C (not applied)")
+            else:
+                log(f"[APPLY] Applying flow to MELCloud")
+                applied_ok = await hp.set_flow_temperature_all_zones_int(
+                    creds.mel_email,
+                    creds.mel_password,
+                    flow_cmd
+                )
+                
+                if applied_ok:
+                    log(f"✓ Applied flow={flow_cmd}°C to MELCloud successfully.")
+                else:
+                    log("[WARN] Could not apply flow to MELCloud.")
         
-        applied_ok = None  # Mark as not applied
+        else:
+            # ========== MONITORING: Skip Control Decision ==========
+            # Use last applied flow (from previous row, which was at XX:00)
+            flow_cmd = prev_last_cmd if prev_last_cmd is not None else 28.0
+            flow_cmd = int(round(float(flow_cmd)))
+            
+            # Calculate prediction for CSV visibility (but don't make decisions)
+            if avg_temp is not None and traj_slope is not None:
+                # Use same 2-hour lookahead as decision logic
+                lookahead_hours = 2.0
+                predicted_temp = avg_temp + (traj_slope * lookahead_hours)
+                predicted_error = control_config.target_room_temp - predicted_temp
+            else:
+                # V4.8: Use last known values if available
+                if avg_temp is not None:
+                    predicted_temp = avg_temp
+                    predicted_error = control_config.target_room_temp - avg_temp
+                else:
+                    # No data at all - use zeros but log warning
+                    predicted_temp = 0.0
+                    predicted_error = 0.0
+                    log("[WARN] No avg_temp available for prediction")
+            
+            reference_flow = flow_cmd  # Use current flow as reference
+            adjustment = 0.0
+            decision_zone = "MONITOR"
+            
+            # Build monitoring comment
+            # Plain integer formatting (no strftime / timedelta arithmetic)
+            decision_comment = f"Monitoring (last applied: {flow_cmd}°C at {now.hour:02d}:00)"
+            
+            log(f"[MONITOR] Between hours - monitoring only")
+            log(f"  Last applied: {flow_cmd}°C, next decision at {(now.hour + 1) % 24:02d}:00")
+            log(f"  Current: avg_temp={fmt2(avg_temp)}°C, slope={fmt2(traj_slope)}°C/h, pred_err={fmt2(predicted_error)}°C")
+            
+            applied_ok = None  # Mark as not applied
+    finally:
+        # Done with MELCloud for this run - also on errors, so the connector is closed
+        # and a still-pending Shelly read is cancelled rather than left un-awaited
+        shelly_task.cancel()  # No-op if it already finished
+        await asyncio.gather(shelly_task, return_exceptions=True)
+        await hp.close()
+        await mel_session.close()
     
     # ========== 11) Build Comment and Append CSV Row ==========
     # Build descriptive comment (DHW status now in dedicated column)
@@ -427,7 +455,7 @@ async def run_once():
             return_temp=return_meas,
             tank_current=tank_cur,
             tank_target=tank_tgt,
-            set_room_temp=control_config["target_room_temp"],
+            set_room_temp=control_config.target_room_temp,
             traj_slope=traj_slope,
             predicted_temp=predicted_temp,
             predicted_error=predicted_error,
@@ -441,6 +469,7 @@ async def run_once():
             shelly_temp=shelly_temp,          # V4.8: Add Shelly temperature
             shelly_humidity=shelly_humidity,  # V4.8: Add Shelly humidity
             comment=comment,
+            shelly_fetched=shelly_fetched,    # Blank Shelly cells when the read was skipped
         )
         log("CSV row appended.")
     except Exception as e:
@@ -7,18 +7,21 @@ Shelly HT Gen3 Backup Temperature Sensor
 Fetches temperature and humidity from Shelly device as backup for LK Systems.
 """
 
-import requests
-import datetime as dt
-from typing import Dict, Optional, Tuple
+import asyncio
+import aiohttp
+from typing import Optional, Tuple
 
-from utils import log, fmt1
+from utils import log, fmt1, json_loads
 from config import CONFIG
 
 
-def get_shelly_temperature() -> Tuple[Optional[float], Optional[float]]:
+async def get_shelly_temperature(session: Optional[aiohttp.ClientSession] = None) -> Tuple[Optional[float], Optional[float]]:
     """
     Get temperature and humidity from Shelly device.
     
+    Args:
+        session: Shared aiohttp session to use (a temporary one is created if None)
+    
     Returns:
         (temperature_c, humidity_percent) or (None, None) if unavailable
     """
@@ -32,14 +35,20 @@ def get_shelly_temperature() -> Tuple[Optional[float], Optional[float]]:
         data = f"id={shelly_config['device_id']}&auth_key={shelly_config['auth_key']}"
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
         
-        timeout = shelly_config.get("timeout", 20)
-        response = requests.post(url, data=data, headers=headers, timeout=timeout)
-        
-        if response.status_code != 200:
-            log(f"[SHELLY] HTTP {response.status_code}")
-            return (None, None)
+        timeout = aiohttp.ClientTimeout(total=shelly_config.get("timeout", 20))
+        own_session = session is None
+        if own_session:
+            session = aiohttp.ClientSession()
+        try:
+            async with session.post(url, data=data, headers=headers, timeout=timeout) as response:
+                if response.status != 200:
+                    log(f"[SHELLY] HTTP {response.status}")
+                    return (None, None)
+                result = json_loads(await response.read())
+        finally:
+            if own_session:
+                await session.close()
         
-        result = response.json()
         if not result.get('isok'):
             log("[SHELLY] API returned isok=False")
             return (None, None)
@@ -61,7 +70,7 @@ def get_shelly_temperature() -> Tuple[Optional[float], Optional[float]]:
         return (float(temperature) if temperature is not None else None,
                 float(humidity) if humidity is not None else None)
         
-    except requests.Timeout:
+    except asyncio.TimeoutError:
         log("[SHELLY] Request timeout")
         return (None, None)
     except Exception as e:
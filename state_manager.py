@@ -18,12 +18,16 @@ Version 5.6 - APPEND-ONLY CSV, NO MIGRATION
 """
 
 import csv
-import json
+import io
+from functools import lru_cache
+from itertools import islice
+import mmap
+import os
 from pathlib import Path
-from typing import Dict, Optional, Any, List, Tuple
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime
 
-from utils import fmt1, fmt2, log
+from utils import fmt1, fmt2, log, epoch_from_ts_str, json_loads
 from config import CONFIG, VERSION
 
 
@@ -67,6 +71,46 @@ BASE_COLS = [
 
 COMMENT_COL = "comment"  # Human-readable explanation (descriptive text only, no data)
 
+TAIL_ROWS = 36  # Rows read back from the CSV tail (6 hours at 10-minute intervals)
+
+_FALLBACK_COLS = frozenset(("avg_temp", "shelly_temp", "shelly_humidity"))  # Carried forward when missing
+_CSV_SPECIAL = (",", '"', "\r", "\n")  # Characters that would need csv quoting
+
+
+@lru_cache(maxsize=4)
+def _desired_header(room_names_sorted: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Header for a sorted room-name tuple (the room set is static, so this is built once)."""
+    room_cols = [f"room::{name}" for name in room_names_sorted]
+    # V4.8: Add Shelly columns after rooms, before comment
+    shelly_cols = ["shelly_temp", "shelly_humidity"]
+    return tuple(BASE_COLS + room_cols + shelly_cols + [COMMENT_COL])
+
+
+def _get_float(row: List[str], col: str, idx: Dict[str, int]) -> Optional[float]:
+    """Float value of column col in row ("" -> None), or None if absent/unparseable."""
+    i = idx.get(col)
+    if i is not None and i < len(row):
+        val = row[i].strip()
+        try:
+            return float(val) if val != "" else None
+        except ValueError:
+            pass
+    return None
+
+
+def _get_float_compat(row: List[str], col: str, idx: Dict[str, int]) -> Optional[float]:
+    """Like _get_float, falling back to the old state_<col> column name."""
+    i = idx.get(col)
+    if i is not None and i < len(row):
+        val = row[i].strip()
+        try:
+            return float(val) if val != "" else None
+        except ValueError:
+            pass
+    if col.startswith("state_"):
+        return None
+    return _get_float(row, f"state_{col}", idx)
+
 
 class CSVStateManager:
     """Manages CSV state persistence with simplified format."""
@@ -79,6 +123,18 @@ class CSVStateManager:
             csv_path: Path to CSV file (defaults to config)
         """
         self.csv_path = csv_path or CONFIG["csv"]["path"]
+        # Per-instance caches: header (never rewritten once it exists) and the last
+        # known good values append_row() falls back to (valid while the CSV stamp matches,
+        # so appends by other writers are picked up)
+        self._header: Optional[List[str]] = None
+        self._last_row_values: Optional[Dict[str, float]] = None
+        self._last_row_values_stamp: Optional[List[int]] = None
+        # Column-name -> index dict and append_row() layout, built once per distinct header
+        self._idx_header: Optional[List[str]] = None
+        self._idx: Dict[str, int] = {}
+        self._layout: Optional[Tuple[List[str], List[str], bool, bool]] = None
+        # (csv_stamp, rows) of the tail last read by this instance
+        self._tail_mem: Optional[Tuple[List[int], List[List[str]]]] = None
     
     def desired_header(self, room_names: List[str]) -> List[str]:
         """
@@ -90,10 +146,7 @@ class CSVStateManager:
         Returns:
             List of column names
         """
-        room_cols = [f"room::{name}" for name in sorted(room_names)]
-        # V4.8: Add Shelly columns after rooms, before comment
-        shelly_cols = ["shelly_temp", "shelly_humidity"]
-        return BASE_COLS + room_cols + shelly_cols + [COMMENT_COL]
+        return list(_desired_header(tuple(sorted(room_names))))
     
     def read_header(self) -> Optional[List[str]]:
         """
@@ -102,14 +155,17 @@ class CSVStateManager:
         Returns:
             List of column names or None if file doesn't exist
         """
-        if not self.csv_path.exists():
+        try:
+            f = self.csv_path.open("r", encoding="utf-8")
+        except FileNotFoundError:
             return None
-        
-        with self.csv_path.open("r", encoding="utf-8") as f:
+        with f:
             line = f.readline()
-            if not line:
-                return None
-            return [h.strip() for h in line.strip().split(",")]
+        if not line:
+            return None
+        # One C-level csv parse of the line: honours quoted names (rooms may contain commas)
+        # and matches how the data rows and the tail read parse the same header
+        return [h.strip() for h in next(csv.reader([line]))]
     
     def read_rows(self) -> List[List[str]]:
         """
@@ -118,33 +174,172 @@ class CSVStateManager:
         Returns:
             List of rows (each row is a list of strings)
         """
-        if not self.csv_path.exists():
+        try:
+            f = self.csv_path.open("r", encoding="utf-8")
+        except FileNotFoundError:
             return []
-        
-        with self.csv_path.open("r", encoding="utf-8") as f:
+        with f:
             return list(csv.reader(f))
     
+    def _read_tail(self, max_rows: int, chunk_size: int = 8192) -> List[List[str]]:
+        """
+        Read header + the last max_rows rows without loading the whole CSV.
+        
+        Seeks back from the end in chunk_size steps until enough complete lines are
+        buffered, so the cost is bounded by max_rows, not by history length.
+        
+        Args:
+            max_rows: Number of data rows wanted
+            chunk_size: Bytes read per backward step
+        
+        Returns:
+            List of rows (header first), or [] if the CSV doesn't exist or is empty
+        """
+        try:
+            f = self.csv_path.open("rb")
+        except FileNotFoundError:
+            return []
+        with f:
+            first = f.readline()
+            if not first:
+                return []
+            header_end = f.tell()
+            pos = f.seek(0, os.SEEK_END)
+            
+            # Need max_rows + 1 newlines: the first buffered line may be cut off mid-row
+            buf = b""
+            while pos > header_end and buf.count(b"\n") <= max_rows:
+                step = min(chunk_size, pos - header_end)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+        
+        lines = buf.splitlines()
+        if pos > header_end:
+            lines = lines[1:]  # Partial line (and possibly a split UTF-8 sequence)
+        text_lines = [first.decode("utf-8")]
+        if max_rows > 0:
+            text_lines.extend(line.decode("utf-8") for line in lines[-max_rows:])
+        return list(csv.reader(text_lines))
+    
+    def _csv_stamp(self) -> Optional[List[int]]:
+        """(size, mtime_ns) of the CSV, or None if it doesn't exist."""
+        try:
+            st = self.csv_path.stat()
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+    
+    def read_tail_rows(self) -> List[List[str]]:
+        """
+        Read header + the last TAIL_ROWS rows.
+        
+        Bounded seek read of the CSV tail (see _read_tail()), kept in memory while the
+        CSV size/mtime are unchanged so the reads of one run parse the tail once.
+        
+        Returns:
+            List of rows (header first), or [] if the CSV doesn't exist
+        """
+        stamp = self._csv_stamp()
+        if stamp is None:
+            return []
+        if self._tail_mem is None or self._tail_mem[0] != stamp:
+            self._tail_mem = (stamp, self._read_tail(TAIL_ROWS))
+        return list(self._tail_mem[1])
+    
+    def find_last_avg_temp(self) -> Optional[float]:
+        """
+        Find the most recent valid avg_temp by scanning the CSV backwards.
+        
+        Memory-maps the file and parses only the trailing lines needed, instead of
+        reading the whole history.
+        
+        Returns:
+            Last parseable avg_temp (°C) or None if there is none
+        """
+        header = self.read_header()
+        if not header or "avg_temp" not in header:
+            return None
+        col = header.index("avg_temp")
+        
+        with self.csv_path.open("rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Empty file
+                return None
+            with mm:
+                pos = mm.size()
+                while pos > 0:
+                    nl = mm.rfind(b"\n", 0, pos)
+                    if nl < 0:
+                        break  # Reached the header line
+                    line = mm[nl + 1:pos].rstrip(b"\r")
+                    pos = nl
+                    if not line:
+                        continue
+                    row = next(csv.reader([line.decode("utf-8", errors="replace")]), [])
+                    if col < len(row):
+                        val = row[col].strip()
+                        if val:
+                            try:
+                                return float(val)
+                            except ValueError:
+                                continue
+        return None
+    
+    @staticmethod
+    def _format_rows(rows: List[List[str]]) -> bytes:
+        """Encode rows exactly as csv.writer would write them to the file."""
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return buf.getvalue().encode("utf-8")
+    
+    def _append(self, data: bytes) -> List[int]:
+        """
+        Append bytes to the CSV through an O_APPEND descriptor (creates the file if missing).
+        
+        No fsync: the write lands in the page cache and the OS batches writeback,
+        which keeps SD-card wear and latency to one small write per run.
+        
+        Returns:
+            (size, mtime_ns) of the CSV after the write, from fstat on the open descriptor
+        """
+        fd = os.open(self.csv_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            st = os.fstat(fd)
+        finally:
+            os.close(fd)
+        return [st.st_size, st.st_mtime_ns]
+    
     def write_header(self, header: List[str]) -> None:
         """
-        Write CSV header.
+        Write CSV header (to a missing or empty CSV; existing content is never touched).
         
         Args:
             header: List of column names
         """
-        with self.csv_path.open("w", newline="", encoding="utf-8") as f:
-            csv.writer(f).writerow(header)
+        self._append(self._format_rows([header]))
     
     def append_rows(self, rows: List[List[str]]) -> None:
         """
         Append rows to CSV.
         
+        All rows are encoded up front and written with a single append, so the cost
+        is independent of history length. Bursts (backfill, replay) should pass all
+        their rows in one call: that is one open/write/close for the whole batch.
+        
         Args:
             rows: List of rows (each row is a list of strings)
         """
-        with self.csv_path.open("a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            for row in rows:
-                writer.writerow(row)
+        self._append_encoded(self._format_rows(rows))
+    
+    def _append_encoded(self, data: bytes) -> None:
+        """Append rows already encoded as data, invalidating the last-row cache."""
+        self._last_row_values = None
+        self._append(data)
     
     def migrate_header_if_needed(self, room_names: List[str]) -> List[str]:
         """
@@ -158,107 +353,144 @@ class CSVStateManager:
             room_names: List of room names
         
         Returns:
-            Current header (never migrated/rewritten)
+            Current header (never migrated/rewritten; cached after the first call)
         """
+        if self._header is not None:
+            return self._header
+        
         want = self.desired_header(room_names)
         current = self.read_header()
         
         if current is None:
             self.write_header(want)
             log(f"CSV created with v3.0+ format ({len(want)} columns)")
+            self._header = want
             return want
         
         # v4.9: No migration of existing files to avoid corruption/version rewriting
         if current != want:
             log(f"[INFO] CSV header differs from desired ({len(current)} vs {len(want)} columns); running in append-only mode without migration")
+        self._header = current
         return current
     
+    def _column_index(self, header: List[str]) -> Dict[str, int]:
+        """Column-name -> index dict for header (rebuilt only when the header changes)."""
+        if header is not self._idx_header and header != self._idx_header:
+            self._idx = {col: i for i, col in enumerate(header)}
+        self._idx_header = header
+        return self._idx
+    
+    def _row_layout(self, header: List[str]) -> Tuple[List[str], bool, bool]:
+        """(room columns, has shelly_temp, has shelly_humidity) for header, cached."""
+        if self._layout is None or self._layout[0] is not header:
+            self._layout = (
+                header,
+                [h for h in header if h.startswith("room::")],
+                "shelly_temp" in header,
+                "shelly_humidity" in header,
+            )
+        return self._layout[1:]
+    
+    @staticmethod
+    def _known_values(header: List[str], row: List[str]) -> Dict[str, float]:
+        """
+        Extract the values append_row() falls back to from one row.
+        
+        Returns:
+            Dict keyed by column name with parseable avg_temp / shelly_temp /
+            shelly_humidity and room::<name> temperatures (empty cells are left out)
+        """
+        values: Dict[str, float] = {}
+        for col, raw in zip(header, row):
+            if col in _FALLBACK_COLS or col.startswith("room::"):
+                raw = raw.strip()
+                if raw:
+                    try:
+                        values[col] = float(raw)
+                    except ValueError:
+                        pass
+        return values
+    
+    def _last_known_values(self) -> Dict[str, float]:
+        """Last known good values for append_row() fallbacks (tail re-read only when the CSV changed)."""
+        stamp = self._csv_stamp()
+        if self._last_row_values is None or self._last_row_values_stamp != stamp:
+            values: Dict[str, float] = {}
+            try:
+                rows = self.read_tail_rows()
+                if len(rows) > 1:
+                    values = self._known_values(rows[0], rows[-1])
+            except Exception:
+                pass  # If we can't read, proceed with None values
+            self._last_row_values = values
+            self._last_row_values_stamp = stamp
+        return self._last_row_values
+    
     def read_last_state(self) -> Tuple[
         Optional[float],  # ema_tout
         Optional[float],  # last_flow_cmd (from 10 min ago)
         Optional[float],  # last_hourly_flow (from 1 hour ago, for single-step)
-        Optional[float],  # flow_2h_ago (from 2 hours ago, for pause detection)
-        Optional[float],  # flow_3h_ago (from 3 hours ago, for pause detection)
         Optional[List[Tuple[str, float]]],   # temp_history: list of (timestamp, temp)
         Optional[float],  # prev_tank_temp
-        Optional[str],    # dhw_start_time (reconstructed if DHW active)
+        Optional[int],    # dhw_start_time (Unix seconds, reconstructed if DHW active)
     ]:
         """
         Read last state from CSV.
         Reconstructs state from previous rows when possible.
         
         Returns:
-            (ema_tout, last_flow_cmd, last_hourly_flow, flow_2h_ago, flow_3h_ago, temp_history, prev_tank_temp, dhw_start_time)
+            (ema_tout, last_flow_cmd, last_hourly_flow, temp_history, prev_tank_temp, dhw_start_time)
+        
+        Only the last TAIL_ROWS rows are consulted (see read_tail_rows()).
         """
-        rows = self.read_rows()
+        rows = self.read_tail_rows()
         if not rows or len(rows) == 1:
-            return (None, None, None, None, None, None, None, None)
+            return (None, None, None, None, None, None)
         
         header = rows[0]
         
         # Build index
-        idx = {col: i for i, col in enumerate(header)}
-        
-        def get_float(row: List[str], col: str) -> Optional[float]:
-            """Get float value from row."""
-            # Try new column name
-            if col in idx and idx[col] < len(row):
-                try:
-                    val = row[idx[col]].strip()
-                    return float(val) if val != "" else None
-                except (ValueError, IndexError):
-                    pass
-            # Try old column name (state_* prefix)
-            old_col = f"state_{col}" if not col.startswith("state_") else col
-            if old_col in idx and idx[old_col] < len(row):
-                try:
-                    val = row[idx[old_col]].strip()
-                    return float(val) if val != "" else None
-                except (ValueError, IndexError):
-                    pass
-            return None
+        idx = self._column_index(header)
         
         last_row = rows[-1]
         
         # Get EMA outdoor temp
-        ema_tout = get_float(last_row, "ema_tout")
+        ema_tout = _get_float_compat(last_row, "ema_tout", idx)
         if ema_tout is None:
-            ema_tout = get_float(last_row, "state_ema_tout")
+            ema_tout = _get_float(last_row, "state_ema_tout", idx)
         
         # Get last flow command (from current row or previous row's flow_cmd)
-        last_flow_cmd = get_float(last_row, "flow_cmd")
+        last_flow_cmd = _get_float_compat(last_row, "flow_cmd", idx)
         if last_flow_cmd is None and len(rows) > 2:
-            last_flow_cmd = get_float(rows[-2], "flow_cmd")
+            last_flow_cmd = _get_float_compat(rows[-2], "flow_cmd", idx)
         
         # Get last hourly flow (from last top-of-hour timestamp where we actually applied)
         # Look for the most recent row with timestamp ending in ":00"
+        # (rows are the bounded tail, so this scans at most TAIL_ROWS rows)
         last_hourly_flow = None
         if "timestamp" in idx:
-            # Search backwards through recent rows (skip current/last row)
-            for row in reversed(rows[:-1]):
-                if row == header:  # Skip header
-                    continue
-                try:
-                    timestamp = row[idx["timestamp"]] if len(row) > idx["timestamp"] else ""
-                    # Check if this is a top-of-hour timestamp (ends with :00)
-                    if timestamp.endswith(":00") or timestamp.endswith("T00"):
-                        last_hourly_flow = get_float(row, "flow_cmd")
-                        if last_hourly_flow is not None:
-                            break
-                except (IndexError, ValueError):
-                    continue
+            ts_col = idx["timestamp"]
+            # Search backwards through recent rows (skip current/last row and the header)
+            for row in islice(reversed(rows), 1, len(rows) - 1):
+                timestamp = row[ts_col] if len(row) > ts_col else ""
+                # Check if this is a top-of-hour timestamp (ends with :00)
+                if timestamp.endswith(":00") or timestamp.endswith("T00"):
+                    last_hourly_flow = _get_float_compat(row, "flow_cmd", idx)
+                    if last_hourly_flow is not None:
+                        break
         
         if last_hourly_flow is None:
             # Fallback to last flow command if no top-of-hour found
             last_hourly_flow = last_flow_cmd
         
-        # Reconstruct temperature history from last 12 rows of avg_temp
+        # Reconstruct temperature history from the last lookback_readings rows of avg_temp
+        # (the trajectory never looks further back, so older rows are not parsed)
+        lookback = CONFIG["prediction"]["lookback_readings"]
         temp_history = []
         if "avg_temp" in idx and "timestamp" in idx:
-            for row in rows[-12:]:  # Last 12 rows (including current)
-                if row == header:  # Skip header
-                    continue
-                temp = get_float(row, "avg_temp")
+            # Last N data rows (including current); the header is excluded by position
+            for row in islice(rows, max(1, len(rows) - lookback), None):
+                temp = _get_float_compat(row, "avg_temp", idx)
                 timestamp = row[idx["timestamp"]] if len(row) > idx["timestamp"] else None
                 if temp is not None and timestamp is not None:
                     temp_history.append((timestamp, temp))
@@ -268,21 +500,21 @@ class CSVStateManager:
             try:
                 val = last_row[idx["state_temp_history"]].strip()
                 if val and val != "":
-                    temp_history = json.loads(val)
-            except (ValueError, IndexError, json.JSONDecodeError):
+                    temp_history = json_loads(val)
+            except (ValueError, IndexError):  # JSONDecodeError is a ValueError
                 pass
         
         # Get previous tank temp (from current row or reconstruct from previous)
-        prev_tank_temp = get_float(last_row, "tank_temp_current")
+        prev_tank_temp = _get_float_compat(last_row, "tank_temp_current", idx)
         if prev_tank_temp is None and "state_prev_tank_temp" in idx:
-            prev_tank_temp = get_float(last_row, "state_prev_tank_temp")
+            prev_tank_temp = _get_float(last_row, "state_prev_tank_temp", idx)
         
         # Reconstruct DHW start time by looking for tank temp rise
         dhw_start_time = None
         if "state_dhw_start_time" in idx:
             try:
                 val = last_row[idx["state_dhw_start_time"]].strip()
-                dhw_start_time = val if val != "" else None
+                dhw_start_time = epoch_from_ts_str(val) if val != "" else None
             except (ValueError, IndexError):
                 pass
         
@@ -290,13 +522,13 @@ class CSVStateManager:
         # by looking at recent tank temp history
         if dhw_start_time is None and "tank_temp_current" in idx and len(rows) > 2:
             try:
-                curr_tank = get_float(last_row, "tank_temp_current")
-                prev_row_tank = get_float(rows[-2], "tank_temp_current")
+                curr_tank = _get_float_compat(last_row, "tank_temp_current", idx)
+                prev_row_tank = _get_float_compat(rows[-2], "tank_temp_current", idx)
                 if curr_tank and prev_row_tank:
                     temp_rise = curr_tank - prev_row_tank
                     if temp_rise >= 3.0:
                         # DHW just started, use current timestamp
-                        dhw_start_time = last_row[idx["timestamp"]] if "timestamp" in idx else None
+                        dhw_start_time = epoch_from_ts_str(last_row[idx["timestamp"]]) if "timestamp" in idx else None
             except:
                 pass
         
@@ -322,35 +554,27 @@ class CSVStateManager:
         # V5.1: Allow count=0 to disable overshoot (removed max(1, ...) safeguard)
         count = max(0, int(count))  # Allow 0, but prevent negative
         
-        rows = self.read_rows()
-        if not rows or len(rows) == 1:
-            return [None] * count if count > 0 else []
+        if count <= TAIL_ROWS:
+            flow_temps = self._scan_flow_temps(self.read_tail_rows(), count)
+        else:
+            flow_temps = self._scan_flow_temps(self._read_tail(count), count)
         
-        header = rows[0]
-        idx = {col: i for i, col in enumerate(header)}
+        missing = count - len(flow_temps)
+        if missing:
+            flow_temps.extend([None] * missing)  # Pad only when history is shorter than count
+        return flow_temps
+    
+    def _scan_flow_temps(self, rows: List[List[str]], count: int) -> List[Optional[float]]:
+        """Up to count flow_temp values from rows (header first), most recent first."""
+        if len(rows) <= 1 or count <= 0:
+            return []
         
+        idx = self._column_index(rows[0])
         if "flow_temp" not in idx:
-            return [None] * count if count > 0 else []
-        
-        def get_float(row: List[str], col: str) -> Optional[float]:
-            if col in idx and idx[col] < len(row):
-                try:
-                    val = row[idx[col]].strip()
-                    return float(val) if val != "" else None
-                except (ValueError, IndexError):
-                    return None
-            return None
-        
-        flow_temps: List[Optional[float]] = []
-        for row in reversed(rows[1:]):  # skip header, iterate backwards
-            if len(flow_temps) >= count:
-                break
-            flow_temps.append(get_float(row, "flow_temp"))
-        
-        while len(flow_temps) < count:
-            flow_temps.append(None)
+            return []
         
-        return flow_temps[:count] if count > 0 else []
+        # Skip header, iterate backwards
+        return [_get_float(row, "flow_temp", idx) for row in islice(reversed(rows), min(count, len(rows) - 1))]
     
     def append_row(
         self,
@@ -372,10 +596,11 @@ class CSVStateManager:
         dhw_active: bool,
         room_map: Dict[str, float],
         ema_tout: float,
-        dhw_start_time: Optional[str],
+        dhw_start_time: Optional[int],
         shelly_temp: Optional[float],      # V4.8: Add
         shelly_humidity: Optional[float],  # V4.8: Add
         comment: str,
+        shelly_fetched: bool = True,
     ) -> None:
         """
         Append a row to CSV with all values in dedicated columns.
@@ -399,50 +624,20 @@ class CSVStateManager:
             dhw_active: DHW heating active (True/False)
             room_map: Dict mapping room name to temperature
             ema_tout: EMA of outdoor temperature (°C)
-            dhw_start_time: ISO timestamp when DHW started (for internal tracking)
+            dhw_start_time: Unix timestamp (seconds) when DHW started (for internal tracking)
             shelly_temp: Shelly backup temperature (°C) - V4.8
             shelly_humidity: Shelly backup humidity (%) - V4.8
             comment: Descriptive comment (text only, no data values)
+            shelly_fetched: False if the Shelly read was skipped on purpose: the Shelly
+                cells are left blank instead of repeating the last reading
         """
         header = self.migrate_header_if_needed(list(room_map.keys()))
-        room_cols = [h for h in header if h.startswith("room::")]
         
         # v4.9: Detect Shelly columns in current header (append only if present)
-        has_shelly_temp = "shelly_temp" in header
-        has_shelly_humidity = "shelly_humidity" in header
+        room_cols, has_shelly_temp, has_shelly_humidity = self._row_layout(header)
         
-        # V4.8: Read last row to get previous values for fallback (prevent empty strings)
-        last_row_values = {}
-        if self.csv_path.exists():
-            try:
-                rows = self.read_rows()
-                if len(rows) > 1:
-                    header_prev = rows[0]
-                    idx = {col: i for i, col in enumerate(header_prev)}
-                    last_row = rows[-1]
-                    
-                    # Store last known values
-                    for col_name in ["avg_temp", "shelly_temp", "shelly_humidity"]:
-                        if col_name in idx and idx[col_name] < len(last_row):
-                            val = last_row[idx[col_name]].strip()
-                            if val and val != "":
-                                try:
-                                    last_row_values[col_name] = float(val)
-                                except ValueError:
-                                    pass
-                    
-                    # Store last known room temperatures
-                    for col in [h for h in header_prev if h.startswith("room::")]:
-                        if col in idx and idx[col] < len(last_row):
-                            val = last_row[idx[col]].strip()
-                            if val and val != "":
-                                try:
-                                    name = col.replace("room::", "")
-                                    last_row_values[f"room_{name}"] = float(val)
-                                except ValueError:
-                                    pass
-            except Exception:
-                pass  # If we can't read, proceed with None values
+        # V4.8: Last row's values for fallback (prevent empty strings); read once per instance
+        last_row_values = self._last_known_values()
         
         # Build row - use last known good values if current is None
         row = [
@@ -474,16 +669,25 @@ class CSVStateManager:
                 row.append(fmt1(current_temp))
             else:
                 # V4.8: Use last known value for this room
-                last_temp = last_row_values.get(f"room_{name}")
+                last_temp = last_row_values.get(col)
                 row.append(fmt1(last_temp) if last_temp is not None else "")
         
-        # v4.9: Only append Shelly columns if present in header
+        # v4.9: Only append Shelly columns if present in header; last known values
+        # only stand in for a failed read, not for one that was skipped
+        shelly_last = last_row_values if shelly_fetched else {}
         if has_shelly_temp:
-            row.append(fmt1(shelly_temp) if shelly_temp is not None else fmt1(last_row_values.get("shelly_temp")))
+            row.append(fmt1(shelly_temp) if shelly_temp is not None else fmt1(shelly_last.get("shelly_temp")))
         if has_shelly_humidity:
-            row.append(fmt1(shelly_humidity) if shelly_humidity is not None else fmt1(last_row_values.get("shelly_humidity")))
-        
-        # Add comment (descriptive text only)
-        row.append(comment)
-        
-        self.append_rows([row])
+            row.append(fmt1(shelly_humidity) if shelly_humidity is not None else fmt1(shelly_last.get("shelly_humidity")))
+        
+        # Add comment (descriptive text only; str() forces lazily built decision comments).
+        # It is the only free-text field, so it is quoted here the way csv.writer would;
+        # line breaks become spaces because the tail readers split the CSV on lines...
+        text = str(comment)
+        if any(c in text for c in _CSV_SPECIAL):
+            text = '"' + text.replace("\r", " ").replace("\n", " ").replace('"', '""') + '"'
+        row.append(text)
+        
+        # ...and the row is joined directly: every other field is a formatted number,
+        # the timestamp or a fixed token, none of which ever needs csv quoting
+        self._append_encoded((",".join(row) + "\r\n").encode("utf-8"))
@@ -6,11 +6,25 @@ Utility functions for the heating flow controller.
 """
 
 import datetime as dt
-from typing import Optional
+import json
+from typing import Any, Optional, Union
+
+# Use orjson for JSON encode/decode if installed (C implementation); stdlib json otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 def fmt1(x) -> str:
     """Format a number to 1 decimal place, or return empty string if invalid."""
+    # None (missing reading) is the common invalid case: return without raising/catching;
+    # floats/ints (nearly every other call) format directly without the float() round-trip
+    if x is None:
+        return ""
+    t = type(x)
+    if t is float or t is int:
+        return f"{x:.1f}"
     try:
         return f"{float(x):.1f}"
     except (ValueError, TypeError):
@@ -19,6 +33,11 @@ def fmt1(x) -> str:
 
 def fmt2(x) -> str:
     """Format a number to 2 decimal places, or return empty string if invalid."""
+    if x is None:
+        return ""
+    t = type(x)
+    if t is float or t is int:
+        return f"{x:.2f}"
     try:
         return f"{float(x):.2f}"
     except (ValueError, TypeError):
@@ -27,13 +46,14 @@ def fmt2(x) -> str:
 
 def log(msg: str) -> None:
     """Print a timestamped log message."""
-    timestamp = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # isoformat gives the same "YYYY-MM-DD HH:MM:SS" without strftime's format parsing
+    timestamp = dt.datetime.now().isoformat(" ", "seconds")
     print(f"[{timestamp}] {msg}")
 
 
 def hour_key_from_dt(d: dt.datetime) -> str:
     """Generate hour key string from datetime (YYYYMMDDHH)."""
-    return d.strftime("%Y%m%d%H")
+    return f"{d.year:04d}{d.month:02d}{d.day:02d}{d.hour:02d}"
 
 
 def hour_key_from_ts_str(ts_iso_min: str) -> Optional[str]:
@@ -45,6 +65,14 @@ def hour_key_from_ts_str(ts_iso_min: str) -> Optional[str]:
         return None
 
 
+def epoch_from_ts_str(ts_iso: str) -> Optional[int]:
+    """Convert ISO timestamp string to Unix timestamp (seconds), or None if invalid."""
+    try:
+        return int(dt.datetime.fromisoformat(ts_iso).timestamp())
+    except (ValueError, TypeError):
+        return None
+
+
 def ema_update(prev: Optional[float], value: float, alpha: float) -> float:
     """
     Update exponential moving average.
@@ -80,3 +108,16 @@ def duty_step(prev_acc: Optional[float], duty_fraction: float) -> tuple[float, b
         return acc - 1.0, True
     return acc, False
 
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON from bytes or str (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps_pretty(obj: Any) -> bytes:
+    """Encode to UTF-8 JSON bytes with 2-space indentation (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")